@@ -0,0 +1,210 @@
+"""Логіка маршрутів API товарів, спільна для server.py (Flask) і asgi.py.
+
+Обробники не знають про фреймворк: отримують аргументи рядка запиту (args),
+заголовки (headers.get з іменами в нижньому регістрі) і вже розібране тіло JSON,
+а повертають (статус, заголовки, тіло), де тіло — bytes або ітератор шматків.
+"""
+import json, time
+from email.utils import formatdate
+from query import parse_query, run_query, changes_page
+from export import FORMATS, export_chunks, pick_encoding, compress
+from validation import FIELDS, validate_item, validate_rows
+import http_cache
+import metrics
+
+MAX_BATCH = 10000
+MAX_CHANGES = 5000
+
+def json_response(obj, status=200, headers=None):
+    headers = dict(headers or {}, **{"Content-Type": "application/json"})
+    return status, headers, json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+class InventoryApi:
+    """Маршрути над сховищем, чергою записів і кешем відповідей /items."""
+
+    def __init__(self, store, writer, items_cache):
+        self.store = store
+        self.writer = writer
+        self.items_cache = items_cache
+
+    def health(self):
+        return json_response({"status": "ok", "seq": self.store.seq})
+
+    def render_metrics(self):
+        return 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}, metrics.render().encode("utf-8")
+
+    @staticmethod
+    def not_modified(headers, etag, modified):
+        return http_cache.not_modified(headers.get("if-none-match"), headers.get("if-modified-since"), etag, modified)
+
+    def cached_json(self, headers, query_string, build):
+        """Відповідає готовими байтами з кешу, доки не змінилась версія даних."""
+        seq = self.store.seq  # до побудови відповіді — див. export
+        encoding = pick_encoding(headers.get("accept-encoding"))
+        etag = http_cache.make_etag(seq, encoding)
+        if self.not_modified(headers, etag, self.store.modified):
+            return 304, {"ETag": etag, "Vary": "Accept-Encoding"}, b""
+        body, extra = self.items_cache.get((query_string, encoding), seq, encoding, etag, build)
+        return 200, dict(extra, **{"Content-Type": "application/json"}), body
+
+    def get_items(self, args, headers, query_string):
+        if not args:
+            def build_all():
+                rows = self.store.all()
+                metrics.inc("inventory_rows_read_total", len(rows))
+                return rows, {}
+            return self.cached_json(headers, query_string, build_all)
+        q, err = parse_query(args, FIELDS)
+        if err:
+            return json_response({"error": err}, 400)
+        def build():
+            page, next_cursor = run_query(self.store, q)
+            metrics.inc("inventory_rows_read_total", len(page))
+            return page, ({"X-Next-Cursor": next_cursor} if next_cursor else {})
+        return self.cached_json(headers, query_string, build)
+
+    def post_item(self, data):
+        with metrics.timed("inventory_stage_seconds", stage="validate"):
+            item, err = validate_item(data)
+        if err:
+            return json_response({"error": err}, 400)
+        def op(b):
+            b.put(item)
+            return b.records[-1]
+        rec = self.writer.submit(op)
+        return json_response(item, 201, {"ETag": f'"{rec["seq"]}"'})
+
+    def put_item(self, item_id, data, headers):
+        if isinstance(data, dict):
+            data = dict(data, id=item_id)
+        with metrics.timed("inventory_stage_seconds", stage="validate"):
+            item, err = validate_item(data, require_id=True)
+        if err:
+            return json_response({"error": err}, 400)
+        if_match = headers.get("if-match")
+        def op(b):
+            old = b.get(item_id)
+            if old is None:
+                return None
+            if if_match and if_match.strip('"') != str(b.version(item_id)):
+                return "conflict"
+            item["created_at"] = old.get("created_at", item["created_at"])
+            b.put(item)
+            return b.records[-1]
+        rec = self.writer.submit(op)
+        if rec is None:
+            return json_response({"error": "Item not found"}, 404)
+        if rec == "conflict":
+            return json_response({"error": "Version conflict", "current": self.store.get(item_id)}, 412)
+        return json_response(item, 200, {"ETag": f'"{rec["seq"]}"'})
+
+    def delete_item(self, item_id, headers):
+        if_match = headers.get("if-match")
+        def op(b):
+            if if_match and b.get(item_id) is not None and if_match.strip('"') != str(b.version(item_id)):
+                return "conflict"
+            return b.delete(item_id)
+        res = self.writer.submit(op)
+        if res == "conflict":
+            return json_response({"error": "Version conflict", "current": self.store.get(item_id)}, 412)
+        if not res:
+            return json_response({"error": "Item not found"}, 404)
+        return json_response({"status": "deleted"})
+
+    def batch(self, data):
+        ops = data.get("ops") if isinstance(data, dict) else data
+        if not isinstance(ops, list):
+            return json_response({"error": "Expected list of ops"}, 400)
+        if len(ops) > MAX_BATCH:
+            return json_response({"error": f"Too many ops (max {MAX_BATCH})"}, 400)
+
+        prepared, results, upserts = [], [], []
+        t = time.perf_counter()
+        for i, o in enumerate(ops):
+            kind = o.get("op", "upsert") if isinstance(o, dict) else None
+            base = o.get("base_version") if isinstance(o, dict) else None
+            if base is not None and not isinstance(base, int):
+                prepared.append((None, None))
+                results.append({"index": i, "id": None, "status": "error", "error": "base_version must be integer"})
+            elif kind == "delete" and o.get("id"):
+                prepared.append(("delete", str(o["id"])))
+                results.append({"index": i, "id": str(o["id"])})
+            elif kind == "upsert":
+                upserts.append(i)
+                prepared.append(("upsert", None))
+                results.append({"index": i, "id": None})
+            else:
+                prepared.append((None, None))
+                results.append({"index": i, "id": None, "status": "error", "error": "Invalid op"})
+        # усі рядки upsert перевіряються разом; без id рядок отримує новий
+        items, errors = validate_rows([ops[i].get("item", ops[i]) for i in upserts])
+        for i, item in zip(upserts, items):
+            if item is not None:
+                prepared[i] = ("upsert", item)
+                results[i]["id"] = item["id"]
+        for j, errs in errors.items():
+            results[upserts[j]].update(status="error", error="; ".join(msg for _, msg in errs))
+        metrics.observe("inventory_stage_seconds", time.perf_counter() - t, stage="validate")
+        # пачка атомарна: одна неправильна операція — не застосовується жодна
+        if any(res.get("status") == "error" for res in results):
+            return json_response({"results": results}, 400)
+
+        # base_version — версія, яку бачив клієнт; якщо рядок відтоді змінився
+        # (або був видалений), операція не застосовується без "force": true
+        def op(b):
+            applied = []
+            for (kind, value), res, o in zip(prepared, results, ops):
+                item_id = value if kind == "delete" else value["id"]
+                base = o.get("base_version")
+                current = b.version(item_id)
+                if base is not None and current is not None and current > base and not o.get("force"):
+                    res.update(status="conflict", version=current, current=b.get(item_id))
+                    continue
+                if kind == "delete":
+                    res["status"] = "deleted" if b.delete(value) else "not_found"
+                else:
+                    old = b.get(item_id)
+                    if old is not None:
+                        value["created_at"] = old.get("created_at", value["created_at"])
+                    b.put(value)
+                    res["status"] = "updated" if old is not None else "created"
+                    res["item"] = value
+                if res["status"] != "not_found":
+                    applied.append((res, b.records[-1]))
+            return applied
+        for res, rec in self.writer.submit(op):
+            res["version"] = rec["seq"]
+        return json_response({"results": results})
+
+    def changes(self, args, headers):
+        try:
+            since = int(args.get("since", 0))
+            limit = min(int(args.get("limit", MAX_CHANGES)), MAX_CHANGES)
+        except ValueError:
+            return json_response({"error": "since and limit must be integers"}, 400)
+        if limit <= 0:
+            return json_response({"error": "limit must be integer > 0"}, 400)  # інакше more=true без змін — вічний цикл
+        etag = http_cache.make_etag(since)
+        if since == self.store.seq and headers.get("if-none-match") == etag:
+            return 304, {"ETag": etag}, b""  # клієнт уже бачив усе — нічого не серіалізуємо
+        page = changes_page(self.store, since, limit)
+        metrics.inc("inventory_rows_read_total", len(page.get("changes", ())))
+        return json_response(page)
+
+    def export(self, args, headers):
+        fmt = args.get("format", "csv")
+        if fmt not in FORMATS:
+            return json_response({"error": "format must be one of: " + ",".join(FORMATS)}, 400)
+        encoding = pick_encoding(headers.get("accept-encoding"))
+        # версія читається до знімка: якщо між ними був запис, ETag буде старішим
+        # за дані (клієнт лише завантажить ще раз), але ніколи не новішим
+        seq, modified, rows = self.store.seq, self.store.modified, self.store.all()
+        metrics.inc("inventory_rows_read_total", len(rows))
+        etag = http_cache.make_etag(seq, fmt, encoding)
+        out = {"ETag": etag, "Last-Modified": formatdate(modified, usegmt=True), "Vary": "Accept-Encoding"}
+        if self.not_modified(headers, etag, modified):
+            return 304, out, b""
+        out["Content-Type"] = FORMATS[fmt]
+        if encoding:
+            out["Content-Encoding"] = encoding
+        return 200, out, compress(export_chunks(rows, FIELDS, fmt), encoding)
@@ -0,0 +1,161 @@
+"""ASGI-варіант API товарів без фреймворку: /health, /items, /items/<id>, /items/batch, /changes, /export.
+
+    uvicorn asgi:app --workers 4
+
+Цикл подій лише читає запити й пише відповіді; робота зі сховищем і серіалізація
+йдуть у пулі потоків (asyncio.to_thread), тож тисячі клієнтів, що опитують сервер,
+не тримають по потоку на з'єднання. Самі маршрути (api.py) спільні з server.py,
+тут лише розбір запиту ASGI і відправка відповіді.
+
+Кілька процесів-воркерів мусять ділити сховище: INVENTORY_STORAGE=sqlite.
+CSV-сховище тримає індекс у пам'яті одного процесу, тож з ним — один воркер.
+"""
+import asyncio, atexit, json, logging, time
+from urllib.parse import parse_qsl
+from storage import get_storage
+from writer import WriteQueue
+from validation import FIELDS
+from api import InventoryApi, json_response
+import http_cache
+import metrics
+
+DATA_FILE = "data/inventory.csv"
+MAX_BODY = 16 * 1024 * 1024
+ITEMS_CACHE_BYTES = 256 * 1024 * 1024
+
+with metrics.timed("inventory_stage_seconds", stage="load"):
+    store = get_storage(DATA_FILE, FIELDS)
+writer = WriteQueue(store)
+atexit.register(store.close)
+
+api = InventoryApi(store, writer, http_cache.JsonCache(ITEMS_CACHE_BYTES))
+log = logging.getLogger("inventory.asgi")
+
+class Request:
+    def __init__(self, scope, body):
+        self.method = scope["method"]
+        self.path = scope["path"]  # ASGI-сервер уже розкодував %XX
+        self.query_string = scope.get("query_string", b"")
+        self.args = {}
+        for k, v in parse_qsl(self.query_string.decode("latin-1"), keep_blank_values=True):
+            self.args.setdefault(k, v)  # як request.args.get у Flask — перше значення
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        self.body = body
+
+    def json(self):
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            return None
+
+def api_health(req):
+    return api.health()
+
+def api_metrics(req):
+    return api.render_metrics()
+
+def api_get_items(req):
+    return api.get_items(req.args, req.headers, req.query_string)
+
+def api_post_item(req):
+    return api.post_item(req.json())
+
+def api_put_item(req, item_id):
+    return api.put_item(item_id, req.json(), req.headers)
+
+def api_delete_item(req, item_id):
+    return api.delete_item(item_id, req.headers)
+
+def api_batch_items(req):
+    return api.batch(req.json())
+
+def api_changes(req):
+    return api.changes(req.args, req.headers)
+
+def api_export(req):
+    return api.export(req.args, req.headers)
+
+ROUTES = {
+    "/health": {"GET": api_health},
+    "/metrics": {"GET": api_metrics},
+    "/items": {"GET": api_get_items, "POST": api_post_item},
+    "/items/batch": {"POST": api_batch_items},
+    "/changes": {"GET": api_changes},
+    "/export": {"GET": api_export},
+}
+ITEM_ROUTES = {"PUT": api_put_item, "DELETE": api_delete_item}
+
+def route(req):
+    methods, args = ROUTES.get(req.path), ()
+    if methods is None and req.path.startswith("/items/") and req.path.count("/") == 2:
+        methods, args = ITEM_ROUTES, (req.path[len("/items/"):],)
+    if methods is None:
+        return "unmatched", json_response({"error": "Not found"}, 404)
+    name = "/items/<item_id>" if methods is ITEM_ROUTES else req.path
+    handler = methods.get(req.method)
+    if handler is None:
+        return name, json_response({"error": "Method not allowed"}, 405, {"Allow": ", ".join(methods)})
+    try:
+        return name, handler(req, *args)
+    except Exception:
+        log.exception("%s %s", req.method, req.path)
+        return name, json_response({"error": "Internal server error"}, 500)
+
+def dispatch(req):
+    """(статус, заголовки, тіло: bytes або ітератор шматків). Виконується в пулі потоків."""
+    started = time.perf_counter()
+    prof = metrics.start_profile(req.headers.get("x-profile"))
+    name, (status, headers, body) = route(req)
+    if prof is not None:
+        if not isinstance(body, bytes):
+            body = b"".join(body)  # потоковий експорт теж проганяємо під профілювальником
+        status, headers, body = 200, {"Content-Type": "text/plain; charset=utf-8", "X-Profile-Status": str(status)}, metrics.profile_report(prof, status)
+    elif isinstance(body, bytes):
+        metrics.inc("inventory_bytes_serialized_total", len(body), route=name)
+    else:
+        body = metrics.counted(body, route=name)
+    metrics.observe("inventory_request_seconds", time.perf_counter() - started, route=name, method=req.method)
+    metrics.inc("inventory_requests_total", route=name, method=req.method, status=status)
+    return status, headers, body
+
+async def lifespan(receive, send):
+    # сховище закривається через atexit, як і в server.py
+    while True:
+        msg = await receive()
+        if msg["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif msg["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+    chunks, size, more = [], 0, True
+    while more:
+        msg = await receive()
+        if msg["type"] == "http.disconnect":
+            return
+        chunks.append(msg.get("body", b""))
+        size += len(chunks[-1])
+        more = msg.get("more_body", False)
+        if size > MAX_BODY:
+            status, headers, body = json_response({"error": "Request body too large"}, 413)
+            break
+    else:
+        status, headers, body = await asyncio.to_thread(dispatch, Request(scope, b"".join(chunks)))
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(k.lower().encode("latin-1"), str(v).encode("latin-1")) for k, v in headers.items()]})
+    if isinstance(body, bytes):
+        await send({"type": "http.response.body", "body": body})
+        return
+    # потоковий експорт: кожен наступний шматок готується в пулі потоків
+    chunks = iter(body)
+    while True:
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            break
+        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
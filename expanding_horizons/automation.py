@@ -1,24 +1,280 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import csv, uuid, os
-from datetime import datetime
+import os, json, threading, queue
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
-
-CSV_HEADER = ['id','name','category','quantity','price','location','created_at']
+import snapshot
+from validation import validate_rows
+from gui import (ItemTable, VirtualTree, TaskRunner, InventoryView,
+                 read_csv_chunks, write_csv_chunks, CSV_HEADER)
 SERVER_URL = "http://127.0.0.1:5000"  
 CACHE_FILE = "cache.csv"
-
-class InventoryApp:
+CACHE_BIN = "cache.bin"
+CACHE_LOG = "cache.log"
+CACHE_FORMAT = "bin"      # "bin" — колонковий двійковий знімок, "csv" — текстовий
+CACHE_COMPACT_MIN = 1000
+JOURNAL_FILE = "cache.journal"
+BATCH_SIZE = 1000
+NET_WORKERS = 4
+CONFLICT_POLICY = "lww"   # "lww" — перемагає локальна зміна, "manual" — питати користувача
+IMPORT_ERRORS_SHOWN = 20
+ROW_ERRORS = {
+    "Duplicate id": "ID має бути унікальним",
+    "Invalid name": "Назва порожня",
+    "Invalid category": "Категорія порожня",
+    "Quantity must be integer >= 0": "Кількість має бути цілим числом >=0",
+    "Price must be number >= 0": "Ціна має бути >=0",
+}
+
+class OpJournal:
+    """Журнал локальних змін, ще не підтверджених сервером (JSON-рядок на операцію).
+
+    Підтвердження дописується рядком {"ack": n, "retry": [...]}, а не
+    перезаписом файлу; файл стискається, лише коли мертвих рядків стає
+    не менше, ніж живих (і не менше COMPACT_MIN).
+    """
+
+    COMPACT_MIN = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self.ops = []
+        self._dead = 0  # рядки файлу, що вже не належать черзі
+        if os.path.exists(path):
+            with open(path,'r',encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # обірваний останній запис
+                    if 'ack' in rec:
+                        self._drop(rec['ack'], rec.get('retry', []))
+                    else:
+                        self.ops.append(rec)
+        self._f = open(path,'a',encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def append(self, op):
+        self.extend([op])
+
+    def extend(self, ops):
+        """Дописує операції одним fsync; можна викликати з фонового потоку."""
+        with self._lock:
+            self._write(ops)
+            self.ops.extend(ops)
+
+    def _write(self, recs):
+        self._f.write(''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in recs))
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def _drop(self, n, retry):
+        self.ops = list(retry) + self.ops[n:]
+        self._dead += n + 1
+
+    def pending_ids(self):
+        return {op['item']['id'] if op['op']=='upsert' else op['id'] for op in self.ops}
+
+    def coalesce(self):
+        """Залишає одну операцію на id (останню), але з base_version першої."""
+        with self._lock:
+            merged = {}
+            for op in self.ops:
+                oid = op['item']['id'] if op['op']=='upsert' else op['id']
+                if oid in merged:
+                    op = dict(op, base_version=merged[oid].get('base_version'))
+                merged[oid] = op
+            if len(merged) < len(self.ops) or self._dead:
+                self._rewrite(list(merged.values()))
+
+    def acknowledge(self, n, retry=()):
+        """Прибирає перші n підтверджених операцій; retry ставить на початок черги.
+        Пише один рядок-маркер; викликати з фонового потоку."""
+        rec = {"ack": n}
+        if retry:
+            rec["retry"] = list(retry)
+        with self._lock:
+            self._write([rec])
+            self._drop(n, retry)
+            if self._dead >= max(self.COMPACT_MIN, len(self.ops)):
+                self._rewrite(self.ops)
+
+    def _rewrite(self, ops):
+        """Перезаписує файл лише живими операціями; викликається під _lock."""
+        tmp = self.path + '.tmp'
+        with open(tmp,'w',encoding='utf-8') as f:
+            for op in ops:
+                f.write(json.dumps(op, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._f.close()
+        os.replace(tmp, self.path)
+        self._f = open(self.path,'a',encoding='utf-8')
+        self.ops = ops
+        self._dead = 0
+
+class ItemCache:
+    """Локальний кеш товарів: знімок (CSV або двійковий) + журнал дописувань (JSON-рядок на зміну).
+
+    Зміна одного рядка дописує один запис у журнал замість перезапису всього
+    знімка. Коли журнал стає задовгим, знімок переписується у фоні (тимчасовий
+    файл + os.replace) і журнал починається заново. Увесь запис на диск іде
+    одним фоновим потоком, тож порядок змін зберігається.
+
+    Перший запис журналу — номер покоління знімка (gen); журнал від іншого
+    покоління (аварія між підміною знімка і очищенням журналу) ігнорується.
+
+    Знімок пишеться у форматі fmt; знімок іншого формату читається і при
+    наступному переписуванні конвертується, після чого старий файл видаляється.
+    """
+
+    def __init__(self, path, bin_path, log_path, fmt=CACHE_FORMAT):
+        self.path = path
+        self.bin_path = bin_path
+        self.log_path = log_path
+        self.fmt = fmt
+        self.gen = 0
+        self.log_count = 0
+        self.disk = ThreadPoolExecutor(max_workers=1, thread_name_prefix="disk")
+
+    def source(self):
+        """Файл знімка для читання: спершу у власному форматі, інакше будь-який наявний."""
+        paths = [self.bin_path, self.path] if self.fmt == "bin" else [self.path, self.bin_path]
+        return next((p for p in paths if os.path.exists(p)), None)
+
+    def read_bin(self):
+        return snapshot.read(self.bin_path, CSV_HEADER)
+
+    def read_meta(self):
+        """Метадані знімка або None для старого кешу без них."""
+        with open(self.path,'r',encoding='utf-8') as f:
+            first = f.readline()
+        return json.loads(first[1:]) if first.startswith('#') else None
+
+    def read_log(self):
+        recs = []
+        if os.path.exists(self.log_path):
+            with open(self.log_path,'r',encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        recs.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        break  # обірваний останній запис
+        if not recs or recs[0] != {"op": "gen", "gen": self.gen}:
+            return []
+        return recs[1:]
+
+    def append(self, recs):
+        self.log_count += len(recs)
+        text = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in recs)
+        self.disk.submit(self._append, text, self.gen)
+
+    def _append(self, text, gen):
+        with open(self.log_path,'a',encoding='utf-8') as f:
+            if f.tell() == 0:
+                f.write(json.dumps({"op": "gen", "gen": gen}) + '\n')
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def rewrite(self, items, versions, seq):
+        """Переписує знімок у фоні; рядки беруться такими, якими будуть на момент запису."""
+        self.gen += 1
+        self.log_count = 0
+        self.disk.submit(self._rewrite, list(items), dict(versions), {"seq": seq, "gen": self.gen})
+
+    def _rewrite(self, items, versions, meta):
+        if self.fmt == "bin":
+            snapshot.write(self.bin_path, items, CSV_HEADER, versions, meta)
+            stale = self.path
+        else:
+            rows = (dict(it, version=versions.get(it['id'], '')) for it in items)
+            for _ in write_csv_chunks(self.path, rows, CSV_HEADER + ['version'], meta):
+                pass
+            stale = self.bin_path
+        with open(self.log_path,'w',encoding='utf-8') as f:
+            f.write(json.dumps({"op": "gen", "gen": meta['gen']}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(stale):
+            os.remove(stale)
+
+class ConnectivityMonitor:
+    """Фоновий потік, що перевіряє /health. UI лише читає кешований стан online.
+
+    Поки сервер недоступний (коло розімкнене), перевірки йдуть з експоненційною
+    затримкою; невдалий справжній запит одразу переводить у офлайн.
+    """
+
+    def __init__(self, url, session=None, interval=10, base_backoff=1, max_backoff=60):
+        self.url = url
+        self.session = session or requests.Session()
+        self.interval = interval
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.online = False
+        self.failures = 0
+        self._wake = threading.Event()
+        threading.Thread(target=self._run, name="connectivity", daemon=True).start()
+
+    def report(self, ok):
+        if ok:
+            self.failures = 0
+            self.online = True
+        else:
+            self.failures += 1
+            self.online = False
+
+    def check_now(self):
+        self._wake.set()
+
+    def _delay(self):
+        if self.online:
+            return self.interval
+        return min(self.max_backoff, self.base_backoff * 2 ** min(self.failures - 1, 16))
+
+    def _run(self):
+        while True:
+            try:
+                r = self.session.get(self.url + "/health", timeout=1.5)
+                self.report(r.status_code == 200)
+            except Exception:  # будь-яка помилка — офлайн, але потік має жити далі
+                self.report(False)
+            self._wake.wait(self._delay())
+            self._wake.clear()
+
+class InventoryApp(InventoryView, TaskRunner):
     def __init__(self, root):
         self.root = root
         root.title("Облік товарів")
         root.geometry("950x550")
 
         self.items = []      
-        self.filtered = None 
+        self.filtered = []
         self.filename = None
-        self.sort_state = {}
+        self.sort_keys = []       # [(колонка, спадання), ...], перша — головна
+        self.table = ItemTable()
+        self.search_job = None
+        self.last_search = None   # (запит, версія індексу, знайдені номери рядків)
+        self.last_seq = 0     # останній побачений номер зміни на сервері
+        self.versions = {}    # id -> версія рядка на сервері, яку ми бачили
+        self.export_etags = {}  # шлях -> ETag експорту, вже збереженого в цей файл
+        self.journal = OpJournal(JOURNAL_FILE)
+        self.cache = ItemCache(CACHE_FILE, CACHE_BIN, CACHE_LOG)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=NET_WORKERS)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.monitor = ConnectivityMonitor(SERVER_URL, self.session)
+        self.was_online = False
+        self.pool = ThreadPoolExecutor(max_workers=NET_WORKERS, thread_name_prefix="net")
+        self.results = queue.Queue()
+        self.task = None      # поточна фонова задача (синхронізація, імпорт, збереження)
+        self.task_cancellable = True
+        self.cancel_requested = False
 
         menubar = tk.Menu(root)
         filemenu = tk.Menu(menubar, tearoff=0)
@@ -37,7 +293,7 @@ class InventoryApp:
         search_frame.pack(fill='x', padx=5, pady=5)
         tk.Label(search_frame, text="Пошук:").pack(side='left')
         self.search_var = tk.StringVar()
-        self.search_var.trace_add("write", lambda *_: self.apply_filter())
+        self.search_var.trace_add("write", lambda *_: self.schedule_search())
         tk.Entry(search_frame, textvariable=self.search_var).pack(side='left', fill='x', expand=True, padx=5)
         ttk.Button(search_frame, text="Очистити", command=self.clear_search).pack(side='left', padx=5)
 
@@ -51,10 +307,12 @@ class InventoryApp:
         for c in cols:
             self.tree.heading(c, text=c.capitalize(), command=lambda _c=c: self.sort_by(_c))
             self.tree.column(c, width=120)
+        self.tree.bind('<Shift-Button-1>', lambda e: self.on_shift_click(e, cols))
         self.tree.bind('<<TreeviewSelect>>', lambda e: self.load_selected())
-        vsb = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+        vsb = ttk.Scrollbar(tree_frame, orient="vertical")
         hsb = ttk.Scrollbar(tree_frame, orient="horizontal", command=self.tree.xview)
-        self.tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
+        self.tree.configure(xscrollcommand=hsb.set)
+        self.view = VirtualTree(self.tree, vsb, lambda it: (it['id'],it['name'],it['category'],it['quantity'],it['price'],it['location']))
         self.tree.grid(row=0, column=0, sticky='nsew')
         vsb.grid(row=0, column=1, sticky='ns')
         hsb.grid(row=1, column=0, sticky='ew')
@@ -80,255 +338,282 @@ class InventoryApp:
         ttk.Button(btn_frame, text="Видалити", command=self.delete).grid(row=0, column=2, padx=2)
         ttk.Button(btn_frame, text="Очистити форму", command=self.clear_form).grid(row=0, column=3, padx=2)
 
+        status_frame = ttk.Frame(root)
+        status_frame.pack(side='bottom', fill='x')
         self.status_var = tk.StringVar()
         self.status_var.set("Готово")
-        ttk.Label(root, textvariable=self.status_var, relief='sunken', anchor='w').pack(side='bottom', fill='x')
+        ttk.Label(status_frame, textvariable=self.status_var, relief='sunken', anchor='w').pack(side='left', fill='x', expand=True)
+        self.progress = ttk.Progressbar(status_frame, length=160)
+        self.cancel_btn = ttk.Button(status_frame, text="Скасувати", command=self.cancel_task)
 
-        self.load_cache()
-        self.try_initial_sync()
+        self.set_status("Працює в офлайн-режимі (сервер недоступний)")
+        self.start_task(self.load_cache(), self.cache_loaded, cancellable=False)
+        self.drain_results()
+        self.watch_connectivity()
 
     def set_status(self, msg):
         self.status_var.set(msg)
         self.root.update_idletasks()
 
-    def validate_form(self, for_update=False):
-        for e in self.fields.values(): e.config(background='white')
-        d = {}
-        errors = []
-
-        id_val = self.fields['id'].get().strip()
-        if not for_update and id_val and any(it['id']==id_val for it in self.items):
-            errors.append(('id','ID має бути унікальним'))
-        d['id'] = id_val or str(uuid.uuid4())
-
-        name = self.fields['name'].get().strip()
-        if not name: errors.append(('name','Назва порожня'))
-        category = self.fields['category'].get().strip()
-        if not category: errors.append(('category','Категорія порожня'))
-        d['name'] = name
-        d['category'] = category
-
-        qtxt = self.fields['quantity'].get().strip()
-        try:
-            q = int(qtxt)
-            if q<0: raise ValueError
-            d['quantity'] = str(q)
-        except:
-            errors.append(('quantity','Кількість має бути цілим числом >=0'))
-
-        ptxt = self.fields['price'].get().strip().replace(',','.')
-        try:
-            p = float(ptxt)
-            if p<0: raise ValueError
-            d['price'] = f"{p:.2f}"
-        except:
-            errors.append(('price','Ціна має бути >=0'))
-
-        d['location'] = self.fields['location'].get().strip()
-
-        if errors:
-            for key,_ in errors:
-                if key in self.fields: self.fields[key].config(background='#f8d7da')
-            self.set_status(errors[0][1])
-            return None
-
-        d['created_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        return d
-
     def is_server_available(self):
-        try:
-            r = requests.get(SERVER_URL + "/items", timeout=1.5)
-            return r.status_code == 200
-        except RequestException:
-            return False
+        return self.monitor.online
 
     def api_get_items(self):
         try:
-            r = requests.get(SERVER_URL + "/items", timeout=3)
+            r = self.session.get(SERVER_URL + "/items", timeout=30)
             r.raise_for_status()
             return r.json(), None
         except RequestException as e:
+            self.monitor.report(False)
             return None, str(e)
 
-    def api_add_item(self, item):
+    def api_batch(self, ops):
         try:
-            r = requests.post(SERVER_URL + "/items", json=item, timeout=3)
-            if r.status_code == 201:
-                return r.json(), None
+            r = self.session.post(SERVER_URL + "/items/batch", json={"ops": ops}, timeout=30)
+            if r.status_code == 200:
+                return r.json()["results"], None
+            if r.status_code == 400 and "results" in r.text:
+                return r.json()["results"], None  # пачку відхилено цілком; неправильні операції мають status "error"
             return None, r.text
         except RequestException as e:
+            self.monitor.report(False)
             return None, str(e)
 
-    def api_update_item(self, item):
+    def api_get_changes(self, since):
         try:
-            r = requests.put(f"{SERVER_URL}/items/{item['id']}", json=item, timeout=3)
-            if r.status_code in (200,201):
-                return r.json(), None
-            return None, r.text
+            r = self.session.get(SERVER_URL + "/changes", params={"since": since},
+                                 headers={"If-None-Match": f'"{since}"'}, timeout=10)
+            if r.status_code == 304:
+                return {"seq": since, "changes": [], "more": False}, None  # на сервері нічого нового
+            r.raise_for_status()
+            return r.json(), None
         except RequestException as e:
+            self.monitor.report(False)
             return None, str(e)
 
-    def api_delete_item(self, item_id):
-        try:
-            r = requests.delete(f"{SERVER_URL}/items/{item_id}", timeout=3)
-            if r.status_code == 200:
-                return True, None
-            return False, r.text
-        except RequestException as e:
-            return False, str(e)
-
     def add(self):
         d = self.validate_form()
         if not d: return
-        if self.is_server_available():
-            item, err = self.api_add_item(d)
-            if err:
-                self.set_status("Помилка сервера: " + str(err))
-                return
-            self.items.append(item)
-            self.set_status("Додано на сервері")
-            self.clear_form()
-            self.apply_filter()
-            self.save_cache()
-        else:
-            self.items.append(d)
-            self.set_status("Сервер недоступний — додано в кеш")
-            self.clear_form()
-            self.apply_filter()
-            self.save_cache()
+        self.items.append(d)
+        self.journal.append({"op": "upsert", "item": d, "base_version": None})
+        self.save_cache(self.cache_put(d))
+        self.clear_form()
+        self.row_added(d)
+        self.push_changes("Додано на сервері", "Сервер недоступний — додано в кеш")
 
     def update(self):
-        sel = self.tree.selection()
-        if not sel: self.set_status("Спочатку виберіть рядок для оновлення"); return
+        it = self.selected_item()
+        if not it: self.set_status("Спочатку виберіть рядок для оновлення"); return
         d = self.validate_form(for_update=True)
         if not d: return
-        old_id = self.tree.item(sel[0])['values'][0]
-        if self.is_server_available():
-            item, err = self.api_update_item(d)
-            if err:
-                self.set_status("Помилка сервера: " + str(err))
-                return
-            for it in self.items:
-                if it['id']==old_id:
-                    it.update(item)
-                    break
-            self.set_status("Оновлено на сервері")
-            self.apply_filter()
-            self.save_cache()
-        else:
-            for it in self.items:
-                if it['id']==old_id:
-                    it.update(d)
-                    break
-            self.set_status("Сервер недоступний — оновлено в кеші")
-            self.apply_filter()
-            self.save_cache()
+        old_id = it['id']
+        d['created_at'] = it.get('created_at') or d['created_at']
+        it.update(d)
+        recs = [self.cache_put(it)]
+        if d['id'] != old_id:
+            self.journal.append({"op": "delete", "id": old_id, "base_version": self.versions.get(old_id)})
+            recs.insert(0, {"op": "delete", "id": old_id})
+        self.journal.append({"op": "upsert", "item": d, "base_version": self.versions.get(d['id'])})
+        self.save_cache(*recs)
+        self.view.selected_id = d['id']
+        self.row_changed(it)
+        self.push_changes("Оновлено на сервері", "Сервер недоступний — оновлено в кеші")
 
     def delete(self):
-        sel = self.tree.selection()
-        if not sel: self.set_status("Нічого не вибрано"); return
-        vals = self.tree.item(sel[0])['values']
-        if not messagebox.askyesno("Підтвердження", f"Видалити '{vals[1]}'?"): return
-        item_id = vals[0]
-        if self.is_server_available():
-            ok, err = self.api_delete_item(item_id)
-            if not ok:
-                self.set_status("Помилка сервера: " + str(err))
-                return
-            self.items = [it for it in self.items if it['id']!=item_id]
-            self.set_status("Видалено на сервері")
-            self.apply_filter()
+        it = self.selected_item()
+        if not it: self.set_status("Нічого не вибрано"); return
+        if not messagebox.askyesno("Підтвердження", f"Видалити '{it['name']}'?"): return
+        item_id = it['id']
+        self.items = [x for x in self.items if x['id']!=item_id]
+        self.journal.append({"op": "delete", "id": item_id, "base_version": self.versions.get(item_id)})
+        self.save_cache({"op": "delete", "id": item_id})
+        self.row_removed(it)
+        self.clear_form()
+        self.push_changes("Видалено на сервері", "Сервер недоступний — видалено в кеші")
+
+    #  Фонові мережеві задачі
+    def start_sync(self, gen, done_msg, fail_msg):
+        def done(ok, cancelled):
+            self.run_search()  # таблиця вже оновлена по рядку (або перебудована при скиданні)
             self.save_cache()
-        else:
-            self.items = [it for it in self.items if it['id']!=item_id]
-            self.set_status("Сервер недоступний — видалено в кеші")
-            self.apply_filter()
-            self.save_cache()
-            self.clear_form()
+            if cancelled:
+                self.set_status("Синхронізацію скасовано")
+            elif ok:
+                self.set_status(done_msg)
+            elif fail_msg:
+                self.set_status(fail_msg)
+            if ok and self.journal.ops and self.is_server_available():
+                self.start_sync(self.flush_journal(), done_msg, fail_msg)  # зміни, зроблені під час синхронізації
+        return self.start_task(gen, done)
+
+    def push_changes(self, online_msg, offline_msg):
+        if not self.is_server_available():
+            self.set_status(offline_msg)
+        elif not self.start_sync(self.flush_journal(), online_msg, offline_msg):
+            self.set_status(offline_msg + " (відправиться після поточної синхронізації)")
+
+    def flush_journal(self, stop_on_error=True):
+        """Відправляє журнал пачками у порядку запису; конфлікти вирішує за CONFLICT_POLICY.
+
+        Сервер відхиляє пачку з неправильною операцією цілком. Такі операції
+        прибираються з журналу (щоб не блокували чергу), їхні рядки — з локальних
+        даних, а решта пачки відправляється знову; справжній стан цих рядків
+        прийде з наступною повною синхронізацією."""
+        if not self.journal.ops:
+            return True
+        _, err = yield lambda: (self.journal.coalesce(), None)
+        if err:
+            self.set_status("Помилка журналу змін: " + str(err))
+            return False
+        total, done, rejected = len(self.journal.ops), 0, []
+        while self.journal.ops:
+            self.show_progress(done, total)
+            chunk = self.journal.ops[:BATCH_SIZE]
+            results, err = yield lambda: self.api_batch(chunk)
+            if err:
+                if stop_on_error:
+                    self.set_status("Помилка відправки на сервер: " + str(err))
+                return False
+            bad = [(op, res) for op, res in zip(chunk, results) if res.get('status') == 'error']
+            if bad:
+                for op, res in bad:
+                    name = op['item'].get('name', '') if op['op']=='upsert' else op['id']
+                    errs = res.get('error', '').split('; ')
+                    rejected.append(f"{name}: " + "; ".join(ROW_ERRORS.get(e, e) for e in errs))
+                keep = [op for op, res in zip(chunk, results) if res.get('status') != 'error']
+                _, err = yield lambda: (self.journal.acknowledge(len(chunk), keep), None)
+                if err:
+                    self.set_status("Помилка журналу змін: " + str(err))
+                    return False
+                self.roll_back([op for op, _ in bad])
+                total -= len(bad)
+                continue
+            retry, recs = [], []
+            for op, res in zip(chunk, results):
+                if res.get('status') == 'conflict':
+                    fixed = self.resolve_conflict(op, res)
+                    if fixed:
+                        retry.append(fixed)
+                    continue
+                elif res.get('status') == 'deleted' or res.get('status') == 'not_found':
+                    self.versions.pop(res['id'], None)
+                elif 'version' in res:
+                    self.versions[res['id']] = res['version']
+                recs.append({"op": "version", "id": res['id'], "version": self.versions.get(res['id'])})
+            _, err = yield lambda: (self.journal.acknowledge(len(chunk), retry), None)
+            if err:
+                self.set_status("Помилка журналу змін: " + str(err))
+                return False
+            self.save_cache(*recs)
+            done += len(chunk) - len(retry)
+        if rejected:
+            lines = rejected[:IMPORT_ERRORS_SHOWN]
+            if len(rejected) > len(lines):
+                lines.append(f"... і ще {len(rejected) - len(lines)}")
+            messagebox.showwarning("Зміни відхилено", "Сервер не прийняв ці зміни, їх скасовано локально "
+                                   "(дані з сервера прийдуть під час синхронізації):\n" + "\n".join(lines))
+        return True
+
+    def roll_back(self, ops):
+        """Прибирає рядки відхилених операцій і змушує наступну синхронізацію почати з нуля,
+        щоб повернути їхній стан із сервера."""
+        ids = {op['item']['id'] if op['op']=='upsert' else op['id'] for op in ops}
+        for it in [it for it in self.items if it['id'] in ids]:
+            self.items.remove(it)
+            self.row_removed(it)
+        recs = [{"op": "delete", "id": i} for i in ids]
+        for i in ids:
+            self.versions.pop(i, None)
+        self.last_seq = 0
+        self.save_cache(*recs, {"op": "seq", "seq": 0})
+
+    def resolve_conflict(self, op, res):
+        """Повертає операцію для повторної відправки або None, якщо беремо версію сервера."""
+        if CONFLICT_POLICY == "manual":
+            name = op['item']['name'] if op['op']=='upsert' else op['id']
+            server = res.get('current')
+            text = f"Запис '{name}' змінено на сервері"
+            text += f":\n{server}\n\n" if server else " (видалено).\n\n"
+            if not messagebox.askyesno("Конфлікт", text + "Залишити локальну версію?"):
+                for it in self.items:
+                    if it['id']==res['id']:
+                        self.table.remove(it)
+                self.items = [it for it in self.items if it['id']!=res['id']]
+                if server:
+                    self.items.append({k: server.get(k,'') for k in CSV_HEADER})
+                    self.table.add(self.items[-1])
+                    self.versions[res['id']] = res['version']
+                    self.save_cache(self.cache_put(self.items[-1]))
+                else:
+                    self.versions.pop(res['id'], None)
+                    self.save_cache({"op": "delete", "id": res['id']})
+                return None
+        return dict(op, force=True)
 
     def load_csv(self):
         path = filedialog.askopenfilename(filetypes=[("CSV files","*.csv")])
         if not path: return
+        def done(ok, cancelled):
+            if cancelled:
+                self.set_status("Імпорт скасовано")
+            elif ok:
+                self.filename = path
+                self.apply_filter()
+                self.cache.rewrite(self.items, self.versions, self.last_seq)
+                self.clear_form()
+                msg = f"Завантажено {len(self.items)} записів"
+                self.push_changes(msg, msg + " (локально)")
+        if not self.start_task(self.import_csv(path), done):
+            self.set_status("Зачекайте завершення поточної операції")
+
+    def import_csv(self, path):
+        """Фонова задача: читає CSV шматками, журналює рядки і замінює ними список."""
+        chunks = read_csv_chunks(path, CSV_HEADER)
+        items = []
         try:
-            with open(path,'r',newline='',encoding='utf-8') as f:
-                r = csv.DictReader(f)
-                self.items = []
-                for row in r:
-                    self.items.append({k: row.get(k,'') for k in CSV_HEADER})
-            self.filename = path
-            self.apply_filter()
-            self.set_status(f"Завантажено {len(self.items)} записів (локально)")
-            self.clear_form()
-            self.save_cache()
-        except Exception as e:
-            messagebox.showerror("Помилка", str(e))
-            self.set_status("Помилка при відкритті CSV")
-
-    def save_csv(self):
-        if not self.filename: return self.save_as_csv()
-        self._write_csv(self.filename)
-
-    def save_as_csv(self):
-        path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files","*.csv")])
-        if not path: return
-        self.filename = path
-        self._write_csv(path)
-
-    def _write_csv(self, path):
-        try:
-            with open(path,'w',newline='',encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=CSV_HEADER)
-                writer.writeheader()
-                for it in self.items:
-                    writer.writerow({k:it.get(k,'') for k in CSV_HEADER})
-            self.set_status(f"Збережено {len(self.items)} записів")
-        except Exception as e:
-            messagebox.showerror("Помилка", str(e))
-            self.set_status("Помилка при збереженні CSV")
-
-    def apply_filter(self):
-        q = self.search_var.get().strip().lower()
-        if q:
-            self.filtered = [it for it in self.items if q in it['name'].lower() or q in it['category'].lower()]
-        else:
-            self.filtered = self.items[:]
-        self.refresh_tree()
-
-    def clear_search(self):
-        self.search_var.set('')
-        self.apply_filter()
-
-    def refresh_tree(self):
-        for i in self.tree.get_children(): self.tree.delete(i)
-        for it in self.filtered:
-            self.tree.insert('', 'end', values=(it['id'],it['name'],it['category'],it['quantity'],it['price'],it['location']))
-
-    def sort_by(self, col):
-        rev = self.sort_state.get(col, False)
-        def key(it):
-            if col=='quantity': 
-                try: return int(it.get(col,0))
-                except: return 0
-            if col=='price': 
-                try: return float(it.get(col,0))
-                except: return 0.0
-            return it.get(col,'').lower()
-        self.items.sort(key=key, reverse=rev)
-        self.sort_state[col] = not rev
-        self.apply_filter()
-        self.set_status(f"Сортування: {col} {'спадання' if rev else 'зростання'}")
-
-    def load_selected(self):
-        sel = self.tree.selection()
-        if not sel: return
-        vals = self.tree.item(sel[0])['values']
-        keys = ['id','name','category','quantity','price','location']
-        for k,v in zip(keys,vals): 
-            self.fields[k].delete(0,'end'); self.fields[k].insert(0,str(v))
-        self.set_status("Заповнено форму з вибраного рядка")
+            while True:
+                part, err = yield lambda: (next(chunks, None), None)
+                if err:
+                    messagebox.showerror("Помилка", err)
+                    self.set_status("Помилка при відкритті CSV")
+                    return False
+                if part is None:
+                    break
+                rows, done, total = part
+                items.extend(rows)
+                self.show_progress(done, total)
+                self.set_status(f"Імпорт: {len(items)} записів...")
+        finally:
+            chunks.close()
+        self.set_status(f"Перевірка {len(items)} записів...")
+        report, err = yield lambda: (validate_rows(items, keep_created=True), None)
+        if err:
+            messagebox.showerror("Помилка", err)
+            self.set_status("Помилка перевірки CSV")
+            return False
+        valid, errors = report
+        if errors:
+            shown = [f"Запис {i + 1}: " + "; ".join(ROW_ERRORS.get(msg, msg) for _, msg in errs)
+                     for i, errs in islice(sorted(errors.items()), IMPORT_ERRORS_SHOWN)]
+            if len(errors) > IMPORT_ERRORS_SHOWN:
+                shown.append(f"... і ще {len(errors) - IMPORT_ERRORS_SHOWN}")
+            text = f"Помилки в {len(errors)} з {len(items)} записів:\n" + "\n".join(shown)
+            if not messagebox.askyesno("Помилки в CSV", text + f"\n\nІмпортувати решту {len(items) - len(errors)}?"):
+                self.set_status("Імпорт скасовано: помилки в CSV")
+                return False
+        items = [it for it in valid if it is not None]
+        ops = lambda: [{"op": "upsert", "item": it, "base_version": self.versions.get(it['id'])} for it in items]
+        _, err = yield lambda: (self.journal.extend(ops()), None)
+        if err:
+            messagebox.showerror("Помилка", err)
+            self.set_status("Помилка запису журналу змін")
+            return False
+        self.items = items
+        return True
 
     def clear_form(self):
         for e in self.fields.values(): e.delete(0,'end'); e.config(background='white')
+        self.view.selected_id = None
         try:
             self.tree.selection_remove(self.tree.selection())
         except:
@@ -336,93 +621,218 @@ class InventoryApp:
         self.set_status("Форма очищена")
 
     def load_cache(self):
-        if not os.path.exists(CACHE_FILE):
-            self.items = []
+        """Фонова задача: читає знімок кешу (двійковий — одним викликом, CSV — шматками),
+        потім дописаний до нього журнал.
+        Повертає (рядки, версії, seq або None для старого кешу, чи конвертувати знімок) або None."""
+        src = self.cache.source()
+        items, versions = [], {}
+        meta = {"seq": 0, "gen": 0}  # знімка ще немає, але журнал може бути
+        if src == self.cache.bin_path:
+            loaded, err = yield lambda: (self.cache.read_bin(), None)
+            if err:
+                return None
+            meta, items, versions = loaded
+        elif src == self.cache.path:
+            meta, err = yield lambda: (self.cache.read_meta(), None)
+            if err:
+                return None
+            chunks = read_csv_chunks(src, CSV_HEADER + ['version'])
+            def next_chunk():
+                part = next(chunks, None)
+                if part is None:
+                    return None, None
+                chunk, done, total = part
+                vers = {}
+                for row in chunk:
+                    v = row.pop('version')
+                    if v:
+                        vers[row['id']] = int(v)
+                return (chunk, vers, done, total), None
+            rows = {}
+            while True:
+                part, err = yield next_chunk
+                if err:
+                    return None
+                if part is None:
+                    break
+                chunk, vers, done, total = part
+                rows.update((it['id'], it) for it in chunk)
+                versions.update(vers)
+                self.show_progress(done, total)
+            items = list(rows.values())
+        if meta is None:
+            return items, versions, None, True
+        convert = src is not None and src != (self.cache.bin_path if self.cache.fmt == "bin" else self.cache.path)
+        self.cache.gen = meta.get('gen', 0)
+        recs, err = yield lambda: (self.cache.read_log(), None)
+        recs = recs or []
+        seq = meta.get('seq', 0)
+        if recs:
+            rows = {it['id']: it for it in items}
+            for rec in recs:
+                if rec['op'] == 'put':
+                    rows[rec['item']['id']] = rec['item']
+                elif rec['op'] == 'delete':
+                    rows.pop(rec['id'], None)
+                elif rec['op'] == 'seq':
+                    seq = rec['seq']
+                    continue
+                item_id = rec['item']['id'] if rec['op'] == 'put' else rec['id']
+                if rec.get('version') is not None:
+                    versions[item_id] = rec['version']
+                else:
+                    versions.pop(item_id, None)
+            items = list(rows.values())
+        self.cache.log_count = len(recs)
+        return items, versions, seq, convert
+
+    def cache_loaded(self, loaded, cancelled):
+        if loaded is None:
+            self.set_status("Помилка читання кешу")
             return
-        try:
-            with open(CACHE_FILE,'r',newline='',encoding='utf-8') as f:
-                r = csv.DictReader(f)
-                self.items = [{k: row.get(k,'') for k in CSV_HEADER} for row in r]
-            self.apply_filter()
+        self.items, self.versions, seq, convert = loaded
+        if seq is None:
+            # старий кеш без метаданих: один раз відправляємо все і переписуємо у новому форматі
+            self.last_seq = 0
+            if not self.journal.ops:
+                self.journal.extend([{"op": "upsert", "item": it, "base_version": None} for it in self.items])
+        else:
+            self.last_seq = seq
+        if convert:
+            self.cache.rewrite(self.items, self.versions, self.last_seq)
+        self.apply_filter()
+        self.save_cache()
+        if self.cache.source():
             self.set_status("Завантажено кеш")
-        except Exception as e:
-            self.set_status("Помилка читання кешу")
 
-    def save_cache(self):
-        try:
-            with open(CACHE_FILE,'w',newline='',encoding='utf-8') as f:
-                w = csv.DictWriter(f, fieldnames=CSV_HEADER)
-                w.writeheader()
-                for it in self.items:
-                    w.writerow({k:it.get(k,'') for k in CSV_HEADER})
-        except:
-            pass
-
-    def try_initial_sync(self):
-        if self.is_server_available():
-            self.set_status("Сервер доступний — синхронізуюсь...")
-            self.sync_with_server(stop_on_error=False)
-        else:
+    def cache_put(self, it):
+        return {"op": "put", "item": {k: it.get(k,'') for k in CSV_HEADER}, "version": self.versions.get(it['id'])}
+
+    def save_cache(self, *recs):
+        """Дописує зміни в журнал кешу; задовгий журнал зливається в новий знімок у фоні."""
+        if recs:
+            self.cache.append(list(recs))
+        if self.cache.log_count > CACHE_COMPACT_MIN + len(self.items) // 4:
+            self.cache.rewrite(self.items, self.versions, self.last_seq)
+
+    def watch_connectivity(self):
+        online = self.monitor.online
+        if online and not self.was_online:
+            # поки йде інша задача (наприклад, читання кешу) — спробуємо наступного разу
+            if self.start_sync(self.sync_with_server(stop_on_error=False), "Синхронізація завершена", None):
+                self.was_online = True
+                self.set_status("Сервер доступний — синхронізуюсь...")
+        elif not online and self.was_online:
+            self.was_online = False
             self.set_status("Працює в офлайн-режимі (сервер недоступний)")
+        self.root.after(500, self.watch_connectivity)
 
     def sync_now(self):
         if not self.is_server_available():
+            self.monitor.check_now()
             self.set_status("Не вдалось з'єднатись із сервером")
             return
-        ok = self.sync_with_server()
-        if ok:
-            self.set_status("Синхронізація завершена")
-        else:
-            self.set_status("Помилка синхронізації")
+        if not self.start_sync(self.sync_with_server(), "Синхронізація завершена", "Помилка синхронізації"):
+            self.set_status("Синхронізація вже триває")
 
     def sync_with_server(self, stop_on_error=True):
-        server_items, err = self.api_get_items()
-        if err:
-            if stop_on_error:
-                self.set_status("Помилка отримання з сервера: " + str(err))
+        ok = yield from self.flush_journal(stop_on_error)
+        if not ok and stop_on_error:
             return False
-        server_map = {it['id']: it for it in server_items}
+        ok = (yield from self.pull_changes(stop_on_error)) and ok
+        return ok
 
-        for local in list(self.items):
-            sid = local.get('id')
-            if not sid or sid not in server_map:
-                res, err = self.api_add_item(local)
+    def pull_changes(self, stop_on_error=True):
+        while True:
+            self.show_progress(0, None)
+            data, err = yield lambda: self.api_get_changes(self.last_seq)
+            if err:
+                if stop_on_error:
+                    self.set_status("Помилка отримання змін: " + str(err))
+                return False
+            if data.get("reset"):
+                server_items, err = yield self.api_get_items
                 if err:
                     if stop_on_error:
-                        self.set_status("Помилка додавання на сервер: " + str(err))
-                        return False
-                    continue
+                        self.set_status("Помилка отримання з сервера: " + str(err))
+                    return False
+                pending = self.journal.pending_ids()
+                local = {it['id']: it for it in self.items if it['id'] in pending}
+                self.items = [local.pop(it['id'], it) for it in server_items
+                              if it['id'] not in pending or it['id'] in local] + list(local.values())
+                self.table.build(self.items)  # повна пересинхронізація — єдиний випадок повної перебудови
+                self.versions = {it['id']: data["seq"] for it in server_items}
+                self.last_seq = data["seq"]
+                self.cache.rewrite(self.items, self.versions, self.last_seq)
+                return True
+            recs = self.apply_changes(data["changes"])
+            self.last_seq = data["seq"]
+            self.save_cache(*recs, {"op": "seq", "seq": self.last_seq})
+            if not data.get("more"):
+                return True
+
+    def apply_changes(self, changes):
+        """Застосовує зміни з сервера до items і таблиці (по рядку); повертає записи для журналу кешу."""
+        pos = {it['id']: i for i, it in enumerate(self.items)}
+        pending = self.journal.pending_ids()
+        removed, recs = set(), []
+        self.table.expect(len(changes))
+        for ch in changes:
+            cid = ch['id']
+            if cid in pending:
+                continue  # локальна версія ще не відправлена
+            if ch.get('deleted'):
+                removed.add(cid)
+                self.versions.pop(cid, None)
+                recs.append({"op": "delete", "id": cid})
+                continue
+            self.versions[cid] = ch['seq']
+            row = {k: ch.get(k,'') for k in CSV_HEADER}
+            recs.append({"op": "put", "item": row, "version": ch['seq']})
+            if cid in pos:
+                self.table.update(row, self.items[pos[cid]])
+                self.items[pos[cid]] = row
+                removed.discard(cid)
             else:
-                res, err = self.api_update_item(local)
-                if err:
-                    if stop_on_error:
-                        self.set_status("Помилка оновлення на сервер: " + str(err))
-                        return False
-                    continue
-
-        server_items, err = self.api_get_items()
-        if err:
-            if stop_on_error:
-                self.set_status("Помилка отримання після відправки: " + str(err))
-            return False
-        self.items = server_items
-        self.apply_filter()
-        self.save_cache()
-        return True
+                pos[cid] = len(self.items)
+                self.items.append(row)
+                self.table.add(row)
+                removed.discard(cid)
+        if removed:
+            for cid in removed & pos.keys():
+                self.table.remove(self.items[pos[cid]])
+            self.items = [it for it in self.items if it['id'] not in removed]
+        return recs
 
     def export_csv_from_server(self):
-        try:
-            r = requests.get(SERVER_URL + "/export", timeout=5)
-            if r.status_code == 200:
-                path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files","*.csv")])
-                if not path: return
-                with open(path,'w',encoding='utf-8',newline='') as f:
-                    f.write(r.text)
-                self.set_status("Експортовано CSV з сервера")
-            else:
-                self.set_status("Сервер повернув помилку при експорті")
-        except RequestException as e:
-            self.set_status("Помилка під час експорту: " + str(e))
+        path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files","*.csv")])
+        if not path: return
+        etag = self.export_etags.get(path) if os.path.exists(path) else None
+        def download():
+            # відповідь (стиснена gzip, якщо сервер уміє) розпаковується і пишеться шматками
+            headers = {"If-None-Match": etag} if etag else {}
+            try:
+                with self.session.get(SERVER_URL + "/export", headers=headers, timeout=30, stream=True) as r:
+                    if r.status_code == 304:
+                        return "Експорт не змінився з минулого разу", etag
+                    if r.status_code != 200:
+                        return "Сервер повернув помилку при експорті", None
+                    with open(path + '.part','wb') as f:
+                        for chunk in r.iter_content(64 * 1024):
+                            f.write(chunk)
+                os.replace(path + '.part', path)
+                return "Експортовано CSV з сервера", r.headers.get("ETag")
+            except (RequestException, OSError) as e:
+                if os.path.exists(path + '.part'):
+                    os.remove(path + '.part')
+                return "Помилка під час експорту: " + str(e), None
+        def task():
+            msg, new_etag = yield download
+            if new_etag:
+                self.export_etags[path] = new_etag
+            self.set_status(msg)
+        self.set_status("Експорт CSV з сервера...")
+        self.run_task(task())
 
 if __name__=="__main__":
     root = tk.Tk()
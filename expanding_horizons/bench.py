@@ -0,0 +1,322 @@
+"""Навантажувальні тести сервера товарів.
+
+    python bench.py generate --rows 1000000
+    cd bench_data && python ../server.py  # або INVENTORY_STORAGE=sqlite після migrate.py
+    python bench.py run --concurrency 32 --duration 30 --mix query=60,put=15,post=10,delete=5,changes=9,export=1
+    python bench.py compare bench_results/a.json bench_results/b.json
+
+generate пише синтетичний CSV у форматі сховища (детерміновано за --seed)
+у bench_data/data/inventory.csv — сервер, запущений з bench_data, бачить його
+як свій data/inventory.csv, а робочі дані не зачіпаються. Наявне сховище
+(CSV, .wal, .meta.json) перезаписується лише з --force.
+run ганяє суміш запитів з кількох потоків (по постійному з'єднанню на потік)
+і зберігає p50/p95/p99 та пропускну здатність для кожної операції в JSON,
+щоб порівнювати сховища й кешування між запусками.
+"""
+import argparse, csv, http.client, json, math, os, platform, random, sys, threading, time, uuid
+from datetime import datetime
+from urllib.parse import urlencode, urlsplit
+
+FIELDS = ['id','name','category','quantity','price','location','created_at']
+CATEGORIES = ['напій', 'їжа', 'техніка', 'одяг', 'канцелярія', 'інструменти', 'іграшки', 'книги']
+LOCATIONS = ['львів', 'київ', 'одеса', 'харків', 'дніпро', 'склад 1', 'склад 2']
+WORDS = ['кава', 'чай', 'ноутбук', 'куртка', 'олівець', 'молоток', "м'яч", 'роман', 'сир', 'кабель', 'лампа', 'зошит']
+DEFAULT_MIX = "query=60,put=15,post=10,delete=5,changes=9,export=1"
+
+def random_item(rnd, item_id=None):
+    return {
+        'id': item_id or str(uuid.UUID(int=rnd.getrandbits(128), version=4)),
+        'name': f"{rnd.choice(WORDS)} {rnd.randint(1, 99999)}",
+        'category': rnd.choice(CATEGORIES),
+        'quantity': str(rnd.randint(0, 1000)),
+        'price': f"{rnd.uniform(1, 5000):.2f}",
+        'location': rnd.choice(LOCATIONS),
+        'created_at': datetime.fromtimestamp(1.7e9 + rnd.randint(0, 30_000_000)).strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+def generate(rows, out, seed, force=False):
+    """Пише rows синтетичних товарів у out (атомарно, через тимчасовий файл).
+
+    Якщо там уже є сховище, без force кидає FileExistsError.
+    """
+    base = os.path.splitext(out)[0]
+    stale = (base + ".wal", base + ".wal.old", base + ".meta.json")
+    existing = [p for p in (out,) + stale if os.path.exists(p)]
+    if existing and not force:
+        raise FileExistsError(f"Сховище вже існує ({', '.join(existing)}); додайте --force, щоб перезаписати")
+    rnd = random.Random(seed)
+    folder = os.path.dirname(out)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp = out + '.tmp'
+    with open(tmp, 'w', newline='', encoding='utf-8') as f:
+        w = csv.DictWriter(f, fieldnames=FIELDS)
+        w.writeheader()
+        for start in range(0, rows, 10000):
+            w.writerows(random_item(rnd) for _ in range(min(10000, rows - start)))
+    os.replace(tmp, out)
+    # старий журнал і метадані належать іншим даним
+    for p in stale:
+        if os.path.exists(p):
+            os.remove(p)
+
+class Client:
+    """Постійне HTTP-з'єднання одного потоку навантаження."""
+
+    def __init__(self, url, timeout):
+        parts = urlsplit(url)
+        self.host, self.port, self.timeout = parts.hostname, parts.port or 80, timeout
+        self.conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        """(статус, кількість байтів відповіді, заголовки); при обриві перепідключається один раз."""
+        headers = dict(headers or {})
+        if body is not None:
+            body = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                r = self.conn.getresponse()
+                size = 0
+                while True:
+                    chunk = r.read(64 * 1024)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                return r.status, size, dict(r.getheaders())
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt == 2:
+                    raise
+
+class Pool:
+    """Спільний набір id для PUT/DELETE; видалений id більше не видається."""
+
+    def __init__(self, ids, seed):
+        self.ids = list(ids)
+        self.lock = threading.Lock()
+        self.rnd = random.Random(seed)
+
+    def pick(self):
+        with self.lock:
+            return self.rnd.choice(self.ids) if self.ids else None
+
+    def take(self):
+        with self.lock:
+            if not self.ids:
+                return None
+            i = self.rnd.randrange(len(self.ids))
+            self.ids[i], self.ids[-1] = self.ids[-1], self.ids[i]
+            return self.ids.pop()
+
+    def add(self, item_id):
+        with self.lock:
+            self.ids.append(item_id)
+
+def fetch_ids(client, limit):
+    """До limit наявних id посторінково через ?fields=id."""
+    ids, cursor = [], None
+    while len(ids) < limit:
+        params = {'fields': 'id', 'limit': min(5000, limit - len(ids))}
+        if cursor:
+            params['cursor'] = cursor
+        client.conn = client.conn or http.client.HTTPConnection(client.host, client.port, timeout=client.timeout)
+        client.conn.request('GET', '/items?' + urlencode(params))
+        r = client.conn.getresponse()
+        page = json.loads(r.read())
+        if r.status != 200:
+            sys.exit(f"GET /items повернув {r.status}: {page}")
+        ids.extend(row['id'] for row in page)
+        cursor = r.getheader('X-Next-Cursor')
+        if not cursor:
+            break
+    return ids
+
+def make_ops(pool, rnd_seed):
+    rnd = random.Random(rnd_seed)
+    def query(c):
+        params = {'category': rnd.choice(CATEGORIES), 'limit': 100}
+        if rnd.random() < 0.5:
+            params['location'] = rnd.choice(LOCATIONS)
+        return c.request('GET', '/items?' + urlencode(params))
+    def list_all(c):
+        return c.request('GET', '/items', headers={'Accept-Encoding': 'gzip'})
+    def post(c):
+        item = random_item(rnd)
+        del item['id'], item['created_at']
+        status, size, headers = c.request('POST', '/items', item)
+        return status, size, headers
+    def put(c):
+        item_id = pool.pick()
+        if item_id is None:
+            return post(c)
+        return c.request('PUT', f'/items/{item_id}', random_item(rnd, item_id))
+    def delete(c):
+        item_id = pool.take()
+        if item_id is None:
+            return post(c)
+        return c.request('DELETE', f'/items/{item_id}')
+    def changes(c):
+        return c.request('GET', '/changes?' + urlencode({'since': 0, 'limit': 100}))
+    def export(c):
+        return c.request('GET', '/export', headers={'Accept-Encoding': 'gzip'})
+    def health(c):
+        return c.request('GET', '/health')
+    return {'query': query, 'list': list_all, 'post': post, 'put': put, 'delete': delete,
+            'changes': changes, 'export': export, 'health': health}
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+def percentile(sorted_vals, p):
+    if not sorted_vals:
+        return None
+    k = max(0, min(len(sorted_vals) - 1, math.ceil(p / 100 * len(sorted_vals)) - 1))  # nearest-rank
+    return sorted_vals[k]
+
+def run(args):
+    mix = parse_mix(args.mix)
+    seed_client = Client(args.url, args.timeout)
+    pool = Pool(fetch_ids(seed_client, args.ids), args.seed)
+    seeded = len(pool.ids)
+    names = list(mix)
+    unknown = [n for n in names if n not in make_ops(pool, 0)]
+    if unknown:
+        sys.exit("Невідомі операції: " + ", ".join(unknown))
+    weights = [mix[n] for n in names]
+    stats = {n: {'lat': [], 'errors': 0, 'bytes': 0} for n in names}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+    remaining = [args.requests]
+
+    def worker(wid):
+        rnd = random.Random(args.seed * 1000 + wid)
+        ops = make_ops(pool, args.seed * 1000 + wid)
+        client = Client(args.url, args.timeout)
+        local = {n: {'lat': [], 'errors': 0, 'bytes': 0} for n in names}
+        while time.perf_counter() < deadline:
+            if args.requests:
+                with lock:
+                    if remaining[0] <= 0:
+                        break
+                    remaining[0] -= 1
+            name = rnd.choices(names, weights)[0]
+            t = time.perf_counter()
+            try:
+                status, size, headers = ops[name](client)
+                ok = status < 400 or (name == 'delete' and status == 404)
+            except (http.client.HTTPException, OSError):
+                ok, size = False, 0
+            dt = time.perf_counter() - t
+            s = local[name]
+            s['lat'].append(dt)
+            s['bytes'] += size
+            if not ok:
+                s['errors'] += 1
+        with lock:
+            for n, s in local.items():
+                stats[n]['lat'].extend(s['lat'])
+                stats[n]['errors'] += s['errors']
+                stats[n]['bytes'] += s['bytes']
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    report = {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'label': args.label,
+        'config': {'url': args.url, 'concurrency': args.concurrency, 'duration': args.duration,
+                   'requests': args.requests, 'mix': mix, 'seed': args.seed, 'ids': seeded},
+        'host': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'elapsed_s': round(elapsed, 3),
+        'endpoints': {},
+    }
+    total = 0
+    for n, s in stats.items():
+        lat = sorted(s['lat'])
+        total += len(lat)
+        report['endpoints'][n] = {
+            'count': len(lat),
+            'errors': s['errors'],
+            'rps': round(len(lat) / elapsed, 2) if elapsed else None,
+            'mb_received': round(s['bytes'] / 1e6, 3),
+            **{f'p{p}_ms': round(percentile(lat, p) * 1000, 3) if lat else None for p in (50, 95, 99)},
+            'max_ms': round(lat[-1] * 1000, 3) if lat else None,
+        }
+    report['total'] = {'count': total, 'rps': round(total / elapsed, 2) if elapsed else None}
+    print_report(report)
+    os.makedirs(args.results, exist_ok=True)
+    path = os.path.join(args.results, f"{datetime.now():%Y%m%d-%H%M%S}{'-' + args.label if args.label else ''}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результати: {path}")
+
+def print_report(report):
+    print(f"{'операція':<10}{'к-сть':>9}{'помилки':>9}{'rps':>10}{'p50 мс':>10}{'p95 мс':>10}{'p99 мс':>10}")
+    for n, e in report['endpoints'].items():
+        fmt = lambda v: f"{v:>10.2f}" if v is not None else f"{'-':>10}"
+        print(f"{n:<10}{e['count']:>9}{e['errors']:>9}{fmt(e['rps'])}{fmt(e['p50_ms'])}{fmt(e['p95_ms'])}{fmt(e['p99_ms'])}")
+    print(f"усього: {report['total']['count']} запитів, {report['total']['rps']} rps за {report['elapsed_s']} с")
+
+def compare(a_path, b_path):
+    with open(a_path, encoding='utf-8') as f:
+        a = json.load(f)
+    with open(b_path, encoding='utf-8') as f:
+        b = json.load(f)
+    print(f"{'операція':<10}{'метрика':<9}{'A':>12}{'B':>12}{'зміна':>10}")
+    for n in sorted(set(a['endpoints']) | set(b['endpoints'])):
+        for m in ('rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+            va, vb = a['endpoints'].get(n, {}).get(m), b['endpoints'].get(n, {}).get(m)
+            delta = f"{(vb - va) / va * 100:+.1f}%" if va and vb is not None else '-'
+            print(f"{n:<10}{m:<9}{va if va is not None else '-':>12}{vb if vb is not None else '-':>12}{delta:>10}")
+
+def main():
+    ap = argparse.ArgumentParser(description="Навантажувальні тести сервера товарів")
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    g = sub.add_parser('generate', help="згенерувати синтетичний CSV")
+    g.add_argument('--rows', type=int, default=10000)
+    g.add_argument('--out', default='bench_data/data/inventory.csv')
+    g.add_argument('--seed', type=int, default=1)
+    g.add_argument('--force', action='store_true', help="перезаписати наявне сховище разом з .wal і .meta.json")
+    r = sub.add_parser('run', help="запустити навантаження на сервер")
+    r.add_argument('--url', default='http://127.0.0.1:5000')
+    r.add_argument('--concurrency', type=int, default=8)
+    r.add_argument('--duration', type=float, default=10, help="секунд (верхня межа)")
+    r.add_argument('--requests', type=int, default=0, help="зупинитись після N запитів (0 — лише за часом)")
+    r.add_argument('--mix', default=DEFAULT_MIX)
+    r.add_argument('--ids', type=int, default=10000, help="скільки наявних id взяти для PUT/DELETE")
+    r.add_argument('--seed', type=int, default=1)
+    r.add_argument('--timeout', type=float, default=60)
+    r.add_argument('--label', default='', help="мітка запуску, напр. csv або sqlite")
+    r.add_argument('--results', default='bench_results')
+    c = sub.add_parser('compare', help="порівняти два JSON-звіти")
+    c.add_argument('a')
+    c.add_argument('b')
+    args = ap.parse_args()
+    if args.cmd == 'generate':
+        t = time.perf_counter()
+        try:
+            generate(args.rows, args.out, args.seed, args.force)
+        except FileExistsError as e:
+            sys.exit(str(e))
+        print(f"Згенеровано {args.rows} рядків у {args.out} за {time.perf_counter() - t:.1f} с")
+    elif args.cmd == 'run':
+        run(args)
+    else:
+        compare(args.a, args.b)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import csv, io, json, zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHUNK_ROWS = 1000
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'columnar': 'application/json; charset=utf-8',
+}
+
+def _csv_chunks(rows, fields):
+    buf = io.StringIO()
+    w = csv.DictWriter(buf, fieldnames=fields, extrasaction='ignore')
+    w.writeheader()
+    for i in range(0, len(rows), CHUNK_ROWS):
+        w.writerows(rows[i:i + CHUNK_ROWS])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+def _ndjson_chunks(rows, fields):
+    for i in range(0, len(rows), CHUNK_ROWS):
+        yield ''.join(json.dumps({f: r.get(f, '') for f in fields}, ensure_ascii=False) + '\n'
+                      for r in rows[i:i + CHUNK_ROWS])
+
+def _columnar_chunks(rows, fields):
+    """{"fields": [...], "rows": n, "columns": {"id": [...], ...}} — стовпець за стовпцем,
+    як у колонкових форматах: однотипні значення йдуть підряд і краще стискаються."""
+    yield '{"fields": %s, "rows": %d, "columns": {' % (json.dumps(fields), len(rows))
+    for n, f in enumerate(fields):
+        yield ('' if n == 0 else ', ') + json.dumps(f) + ': ['
+        for i in range(0, len(rows), CHUNK_ROWS):
+            part = json.dumps([r.get(f, '') for r in rows[i:i + CHUNK_ROWS]], ensure_ascii=False)[1:-1]
+            yield ('' if i == 0 or not part else ', ') + part
+        yield ']'
+    yield '}}\n'
+
+def export_chunks(rows, fields, fmt):
+    """Текстові шматки експорту rows у форматі fmt (ключ FORMATS)."""
+    gen = {'csv': _csv_chunks, 'ndjson': _ndjson_chunks, 'columnar': _columnar_chunks}[fmt]
+    for chunk in gen(rows, fields):
+        yield chunk.encode('utf-8')
+
+def pick_encoding(accept):
+    """Найкраще стиснення з заголовка Accept-Encoding: zstd (якщо встановлено), gzip або None."""
+    offered = {}
+    for part in (accept or '').split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        offered[name.strip().lower()] = q
+    for enc in ('zstd', 'gzip'):
+        if enc == 'zstd' and zstandard is None:
+            continue
+        if offered.get(enc, offered.get('*', 0)) > 0:
+            return enc
+    return None
+
+def compress(chunks, encoding):
+    """Стискає потік шматків на льоту, не збираючи його в пам'яті."""
+    if encoding is None:
+        yield from chunks
+        return
+    if encoding == 'zstd':
+        c = zstandard.ZstdCompressor().compressobj()
+    else:
+        c = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        out = c.compress(chunk)
+        if out:
+            yield out
+    yield c.flush()
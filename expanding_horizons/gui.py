@@ -0,0 +1,621 @@
+"""Спільні частини Tk-застосунків обліку товарів.
+
+Потокове читання й запис CSV, колонкова модель ItemTable, віртуальне дерево
+VirtualTree, TaskRunner — фонові задачі-генератори з індикатором прогресу — та
+InventoryView зі спільною логікою форми, пошуку й сортування обох застосунків.
+Модуль не залежить від мережі, тож його імпортує й офлайн-застосунок у корені.
+"""
+from tkinter import ttk, messagebox, filedialog
+import csv, os, json, queue, codecs, bisect, operator, uuid
+from datetime import datetime
+from itertools import compress, repeat, islice, chain
+
+CHUNK_ROWS = 5000
+CSV_HEADER = ['id','name','category','quantity','price','location','created_at']
+SEARCH_DELAY_MS = 150
+
+def read_csv_chunks(path, fields, chunk=CHUNK_ROWS):
+    """Читає CSV шматками по chunk рядків: (рядки, прочитано байт, розмір файлу).
+
+    Рядок метаданих '#{...}' на початку (кеш) пропускається.
+    """
+    total = os.path.getsize(path)
+    with open(path,'rb') as fb:
+        lines = codecs.iterdecode(fb, 'utf-8-sig')
+        first = next(lines, '')
+        if not first.startswith('#'):
+            lines = chain([first], lines)
+        reader = csv.DictReader(lines)
+        while True:
+            rows = [{k: row.get(k) or '' for k in fields} for row in islice(reader, chunk)]
+            if not rows:
+                return
+            yield rows, fb.tell(), total
+
+def write_csv_chunks(path, rows, fields, meta=None, chunk=CHUNK_ROWS):
+    """Пише рядки шматками в тимчасовий файл (yield — скільки вже записано)
+    і наприкінці атомарно підміняє ним path. Якщо запис перервано, тимчасовий файл видаляється."""
+    tmp = path + '.tmp'
+    rows = iter(rows)
+    done = 0
+    try:
+        with open(tmp,'w',newline='',encoding='utf-8') as f:
+            if meta is not None:
+                f.write('#' + json.dumps(meta) + '\n')
+            w = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+            w.writeheader()
+            while True:
+                part = list(islice(rows, chunk))
+                if not part:
+                    break
+                w.writerows(part)
+                done += len(part)
+                yield done
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        tmp = None
+    finally:
+        if tmp and os.path.exists(tmp):
+            os.remove(tmp)
+
+class ItemTable:
+    """Колонкова модель товарів для пошуку та сортування.
+
+    Рядки лишаються словниками рядків, але поруч тримаються типізовані колонки:
+    кількість і ціна розбираються в числа один раз при завантаженні. Для колонок,
+    за якими вже сортували, зберігаються відсортовані перестановки номерів рядків,
+    що оновлюються по одному рядку при змінах.
+
+    Назви всіх рядків склеєні в один текст, тож пошук — це str.find на рівні C,
+    а не цикл Python по кожному товару. Змінені та нові назви тримаються окремо
+    (extra), доки їх не назбирається багато. Категорій мало, тому для них
+    є індекс категорія -> номери рядків, і перевіряються лише різні значення.
+    """
+
+    SEP = '\x00'
+    COLUMNS = ('id','name','category','quantity','price','location')
+    PERM_UPDATES_MAX = 16  # insort коштує O(n) на перестановку, як і пересортування на ~16 змін
+
+    def __init__(self, items=()):
+        self.version = 0
+        self.build(items)
+
+    @staticmethod
+    def norm(s):
+        return str(s).strip().lower()
+
+    @staticmethod
+    def to_int(v):
+        try:
+            return int(v)
+        except (TypeError, ValueError):
+            return 0
+
+    @staticmethod
+    def to_float(v):
+        try:
+            return float(str(v).replace(',', '.'))
+        except (TypeError, ValueError):
+            return 0.0
+
+    def parse(self, it, col):
+        if col == 'quantity':
+            return self.to_int(it.get(col, 0))
+        if col == 'price':
+            return self.to_float(it.get(col, 0))
+        return self.norm(it.get(col, ''))
+
+    def build(self, items):
+        self.rows = list(items)
+        self.cols = {c: [self.parse(it, c) for it in self.rows] for c in self.COLUMNS}
+        self.names = self.cols['name']
+        self.cats = self.cols['category']
+        self.starts = []
+        pos = 0
+        for name in self.names:
+            self.starts.append(pos)
+            pos += len(name) + 1
+        self.text = self.SEP.join(self.names) + self.SEP
+        self.extra = set()      # рядки, чиїх актуальних назв немає в тексті
+        self.by_cat = {}
+        for i, c in enumerate(self.cats):
+            self.by_cat.setdefault(c, set()).add(i)
+        self.where = {id(it): i for i, it in enumerate(self.rows)}
+        self.removed = 0
+        self.perms = {}         # колонка -> номери живих рядків за зростанням
+        self.orders = {}        # ((колонка, спадання), ...) -> готовий порядок
+        self.version += 1
+
+    def add(self, it):
+        i = len(self.rows)
+        self.where[id(it)] = i
+        self.rows.append(it)
+        for c in self.COLUMNS:
+            self.cols[c].append(self.parse(it, c))
+        self.by_cat.setdefault(self.cats[i], set()).add(i)
+        self.extra.add(i)
+        self._perm_insert(i)
+        self._changed()
+
+    def update(self, it, old=None):
+        """Оновлює рядок it; old — попередній словник, якщо рядок замінено новим."""
+        i = self.where.pop(id(it if old is None else old), None)
+        if i is None:
+            return self.add(it)
+        self.where[id(it)] = i
+        self.rows[i] = it
+        self._perm_remove(i)
+        old_cat = self.cats[i]
+        for c in self.COLUMNS:
+            self.cols[c][i] = self.parse(it, c)
+        self._move_cat(i, old_cat)
+        self.extra.add(i)
+        self._perm_insert(i)
+        self._changed()
+
+    def remove(self, it):
+        i = self.where.pop(id(it), None)
+        if i is None:
+            return
+        self._perm_remove(i)
+        self.rows[i] = None
+        old_cat = self.cats[i]
+        self.names[i] = self.cats[i] = self.SEP
+        self._move_cat(i, old_cat)
+        self.extra.discard(i)
+        self.removed += 1
+        self._changed()
+
+    def _move_cat(self, i, old):
+        cat = self.cats[i]
+        if old == cat:
+            return
+        ids = self.by_cat[old]
+        ids.discard(i)
+        if not ids:
+            del self.by_cat[old]
+        if cat != self.SEP:
+            self.by_cat.setdefault(cat, set()).add(i)
+
+    def expect(self, n):
+        """Попереджає про n змін поспіль: якщо їх багато, відкидає перестановки,
+        щоб кожна зміна була O(1); потрібні перестановки відсортуються ліниво."""
+        if n > self.PERM_UPDATES_MAX:
+            self.perms = {}
+
+    def _perm_insert(self, i):
+        for c, perm in self.perms.items():
+            bisect.insort(perm, i, key=self.cols[c].__getitem__)
+
+    def _perm_remove(self, i):
+        for perm in self.perms.values():
+            perm.remove(i)
+
+    def _changed(self):
+        self.version += 1
+        self.orders = {}
+        if len(self.extra) + self.removed > 1000 + len(self.rows) // 10:
+            self.build([it for it in self.rows if it is not None])
+
+    def perm(self, col):
+        if col not in self.perms:
+            live = (i for i, it in enumerate(self.rows) if it is not None)
+            self.perms[col] = sorted(live, key=self.cols[col].__getitem__)
+        return self.perms[col]
+
+    def order(self, keys):
+        """Номери рядків, впорядковані за keys [(колонка, спадання), ...].
+
+        Сортування стабільне: перша колонка головна, наступні розв'язують нічиї.
+        Зворотний до вже обчисленого порядок береться простим розворотом.
+        """
+        keys = tuple(keys)
+        if keys in self.orders:
+            return self.orders[keys]
+        flipped = tuple((c, not r) for c, r in keys)
+        if flipped in self.orders:
+            order = self.orders[flipped][::-1]
+        else:
+            col, rev = keys[-1]
+            order = self.perm(col)[::-1] if rev else list(self.perm(col))
+            for col, rev in reversed(keys[:-1]):
+                order.sort(key=self.cols[col].__getitem__, reverse=rev)
+        self.orders[keys] = order
+        return order
+
+    def _name_hits(self, q):
+        text, starts, n = self.text, self.starts, len(self.starts)
+        cap = 1000 + n // 50
+        found = []
+        pos = text.find(q)
+        while pos != -1:
+            r = bisect.bisect_right(starts, pos) - 1
+            found.append(r)
+            if len(found) > cap:
+                # запит малоселективний — дешевше один прохід map по всіх назвах
+                return list(compress(range(len(self.names)), map(operator.contains, self.names, repeat(q))))
+            pos = text.find(q, starts[r + 1] if r + 1 < n else len(text))
+        if self.extra:
+            found = [i for i in found if i not in self.extra and self.rows[i] is not None]
+            found.extend(i for i in self.extra if q in self.names[i])
+            found.sort()
+        elif self.removed:
+            found = [i for i in found if self.rows[i] is not None]
+        return found
+
+    def search(self, q, within=None):
+        """Номери рядків, що містять q; within — звузити попередній результат."""
+        q = self.norm(q)
+        if within is not None:
+            return [i for i in within if q in self.names[i] or q in self.cats[i]]
+        found = self._name_hits(q)
+        cats = [c for c in self.by_cat if q in c]
+        if not cats:
+            return found
+        mask = bytearray(len(self.rows))
+        for i in found:
+            mask[i] = 1
+        for c in cats:
+            for i in self.by_cat[c]:
+                mask[i] = 1
+        return list(compress(range(len(self.rows)), mask))
+
+    def select(self, order, found):
+        """Залишає з порядку order лише номери з found."""
+        mask = bytearray(len(self.rows))
+        for i in found:
+            mask[i] = 1
+        return list(compress(order, map(mask.__getitem__, order)))
+
+    def items(self, found):
+        return [self.rows[i] for i in found]
+
+class VirtualTree:
+    """Treeview, що показує лише видиме вікно великого списку рядків.
+
+    Рядки дерева — це фіксовані слоти, яким при прокрутці лише змінюються
+    значення, тож вартість перемальовування не залежить від розміру списку.
+    """
+
+    def __init__(self, tree, vsb, row_values):
+        self.tree = tree
+        self.vsb = vsb
+        self.row_values = row_values
+        self.rows = []
+        self.top = 0
+        self.slots = 0
+        self.selected_id = None
+        vsb.config(command=self.yview)
+        tree.bind('<Configure>', lambda e: self.render())
+        tree.bind('<MouseWheel>', lambda e: self.scroll(-1 if e.delta > 0 else 1) or 'break')
+        tree.bind('<Button-4>', lambda e: self.scroll(-1) or 'break')
+        tree.bind('<Button-5>', lambda e: self.scroll(1) or 'break')
+        tree.bind('<Prior>', lambda e: self.scroll(-self.visible_count()) or 'break')
+        tree.bind('<Next>', lambda e: self.scroll(self.visible_count()) or 'break')
+
+    def visible_count(self):
+        h = self.tree.winfo_height()
+        if h <= 1:
+            return int(self.tree.cget('height'))
+        row_h = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        return max(1, (h - row_h) // row_h)
+
+    def set_rows(self, rows):
+        self.rows = rows
+        self.render()
+
+    def scroll(self, n):
+        self.top += n
+        self.render()
+
+    def yview(self, *args):
+        n = self.visible_count()
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * len(self.rows))
+        elif args[0] == 'scroll':
+            self.top += int(args[1]) * (n if args[2] == 'pages' else 1)
+        self.render()
+
+    def render(self):
+        n = self.visible_count()
+        self.top = max(0, min(self.top, len(self.rows) - n))
+        window = self.rows[self.top:self.top + n]
+        while self.slots < len(window):
+            self.tree.insert('', 'end', iid=str(self.slots))
+            self.slots += 1
+        while self.slots > len(window):
+            self.slots -= 1
+            self.tree.delete(str(self.slots))
+        selected = None
+        for i, it in enumerate(window):
+            self.tree.item(str(i), values=self.row_values(it))
+            if it['id'] == self.selected_id:
+                selected = str(i)
+        if selected is not None:
+            if self.tree.selection() != (selected,):
+                self.tree.selection_set(selected)
+        elif self.tree.selection():
+            self.tree.selection_remove(self.tree.selection())
+        total = len(self.rows) or 1
+        self.vsb.set(self.top / total, min(1.0, (self.top + n) / total))
+
+    def select_current(self):
+        """Запам'ятовує id вибраного рядка, щоб вибір пережив прокрутку.
+
+        True лише тоді, коли вибрано інший рядок: <<TreeviewSelect>> від
+        selection_set у render() (той самий id в іншому слоті) ігнорується.
+        """
+        sel = self.tree.selection()
+        if not sel or int(sel[0]) >= len(self.rows) - self.top:
+            return False
+        item_id = self.rows[self.top + int(sel[0])]['id']
+        if item_id == self.selected_id:
+            return False
+        self.selected_id = item_id
+        return True
+
+class TaskRunner:
+    """Домішка для застосунку: одна фонова задача-генератор за раз.
+
+    Застосунок має задати root, pool (ThreadPoolExecutor), results (queue.Queue),
+    task, task_cancellable, cancel_requested, progress, cancel_btn і set_status,
+    а також один раз викликати drain_results().
+    """
+
+    def run_task(self, gen, on_done=None):
+        """Виконує генератор на головному потоці Tk.
+
+        Кожен yield віддає функцію, яку треба виконати в пулі потоків;
+        її результат повертається в генератор через drain_results.
+        """
+        def step(value):
+            if self.cancel_requested and gen is self.task:
+                gen.close()
+                value, finished = False, True
+            else:
+                try:
+                    call = gen.send(value)
+                    finished = False
+                except StopIteration as e:
+                    value, finished = e.value, True
+            if finished:
+                if on_done: on_done(value)
+                return
+            fut = self.pool.submit(call)
+            fut.add_done_callback(lambda f: self.results.put((step, f)))
+        step(None)
+
+    def drain_results(self):
+        while True:
+            try:
+                step, fut = self.results.get_nowait()
+            except queue.Empty:
+                break
+            exc = fut.exception()
+            step((None, str(exc)) if exc else fut.result())
+        self.root.after(30, self.drain_results)
+
+    def show_progress(self, done, total):
+        if not self.progress.winfo_ismapped():
+            if self.task_cancellable:
+                self.cancel_btn.pack(side='right')
+            self.progress.pack(side='right', padx=5)
+        if total:
+            self.progress.config(mode='determinate', maximum=total, value=done)
+        else:
+            self.progress.config(mode='indeterminate')
+            self.progress.step(5)
+
+    def hide_progress(self):
+        self.progress.pack_forget()
+        self.cancel_btn.pack_forget()
+
+    def cancel_task(self):
+        if self.task is not None and self.task_cancellable:
+            self.cancel_requested = True
+            self.set_status("Скасування...")
+
+    def start_task(self, gen, on_done, cancellable=True):
+        """Запускає фонову задачу-генератор; одночасно працює лише одна.
+        on_done(результат, чи_скасовано) викликається на потоці Tk."""
+        if self.task is not None:
+            return False
+        self.task = gen
+        self.task_cancellable = cancellable
+        self.cancel_requested = False
+        def done(result):
+            cancelled = self.cancel_requested
+            self.task = None
+            self.cancel_requested = False
+            self.hide_progress()
+            on_done(result, cancelled)
+        self.run_task(gen, done)
+        return True
+
+class InventoryView:
+    """Домішка зі спільною логікою форми, пошуку, сортування і збереження CSV.
+
+    Застосунок має задати root, items, filtered, table (ItemTable), view (VirtualTree),
+    tree, fields, search_var, search_job, last_search, sort_keys, filename і set_status;
+    збереження йде через start_task і show_progress з TaskRunner.
+    """
+
+    def validate_form(self, for_update=False):
+        for e in self.fields.values(): e.config(background='white')
+        d = {}
+        errors = []
+
+        id_val = self.fields['id'].get().strip()
+        if not for_update and id_val and any(it['id']==id_val for it in self.items):
+            errors.append(('id','ID має бути унікальним'))
+        d['id'] = id_val or str(uuid.uuid4())
+
+        name = self.fields['name'].get().strip()
+        if not name: errors.append(('name','Назва порожня'))
+        category = self.fields['category'].get().strip()
+        if not category: errors.append(('category','Категорія порожня'))
+        d['name'] = name
+        d['category'] = category
+
+        qtxt = self.fields['quantity'].get().strip()
+        try:
+            q = int(qtxt)
+            if q<0: raise ValueError
+            d['quantity'] = str(q)
+        except:
+            errors.append(('quantity','Кількість має бути цілим числом >=0'))
+
+        ptxt = self.fields['price'].get().strip().replace(',','.')
+        try:
+            p = float(ptxt)
+            if p<0: raise ValueError
+            d['price'] = f"{p:.2f}"
+        except:
+            errors.append(('price','Ціна має бути >=0'))
+
+        d['location'] = self.fields['location'].get().strip()
+
+        if errors:
+            for key,_ in errors:
+                if key in self.fields: self.fields[key].config(background='#f8d7da')
+            self.set_status(errors[0][1])
+            return None
+
+        d['created_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        return d
+
+    def selected_item(self):
+        sel_id = self.view.selected_id
+        if sel_id is None: return None
+        return next((it for it in self.filtered if it['id']==sel_id), None)
+
+    def load_selected(self):
+        if not self.view.select_current(): return
+        it = self.selected_item()
+        if not it: return
+        keys = ['id','name','category','quantity','price','location']
+        for k in keys:
+            self.fields[k].delete(0,'end'); self.fields[k].insert(0,str(it.get(k,'')))
+        self.set_status("Заповнено форму з вибраного рядка")
+
+    def save_csv(self):
+        if not self.filename: return self.save_as_csv()
+        self._write_csv(self.filename)
+
+    def save_as_csv(self):
+        path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files","*.csv")])
+        if not path: return
+        self.filename = path
+        self._write_csv(path)
+
+    def _write_csv(self, path):
+        rows = list(self.sorted_items())
+        writer = write_csv_chunks(path, rows, CSV_HEADER)
+        def task():
+            try:
+                while True:
+                    n, err = yield lambda: (next(writer, None), None)
+                    if err or n is None:
+                        return err
+                    self.show_progress(n, len(rows))
+            finally:
+                writer.close()
+        def done(err, cancelled):
+            if cancelled:
+                self.set_status("Збереження скасовано")
+            elif err:
+                messagebox.showerror("Помилка", err)
+                self.set_status("Помилка при збереженні CSV")
+            else:
+                self.set_status(f"Збережено {len(rows)} записів")
+        if self.start_task(task(), done):
+            self.set_status("Збереження CSV...")
+        else:
+            self.set_status("Зачекайте завершення поточної операції")
+
+    def matches(self, it):
+        q = ItemTable.norm(self.search_var.get())
+        return not q or q in ItemTable.norm(it['name']) or q in ItemTable.norm(it['category'])
+
+    def apply_filter(self):
+        self.table.build(self.items)
+        self.run_search()
+
+    def schedule_search(self):
+        if self.search_job:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(SEARCH_DELAY_MS, self.run_search)
+
+    def run_search(self):
+        if self.search_job:
+            self.root.after_cancel(self.search_job)
+            self.search_job = None
+        q = ItemTable.norm(self.search_var.get())
+        found = None
+        if q:
+            last = self.last_search
+            # запит лише подовжився — звужуємо попередній результат
+            within = last[2] if last and last[1] == self.table.version and last[0] in q else None
+            found = self.table.search(q, within)
+            self.last_search = (q, self.table.version, found)
+        else:
+            self.last_search = None
+        if self.sort_keys:
+            order = self.table.order(self.sort_keys)
+            self.filtered = self.table.items(order if found is None else self.table.select(order, found))
+        else:
+            self.filtered = self.items[:] if found is None else self.table.items(found)
+        self.refresh_tree()
+
+    def row_added(self, it):
+        self.table.add(it)
+        if self.matches(it):
+            self.filtered.append(it)
+        self.view.render()
+
+    def row_changed(self, it):
+        self.table.update(it)
+        if not self.matches(it):
+            self.filtered = [x for x in self.filtered if x is not it]
+        self.view.set_rows(self.filtered)
+
+    def row_removed(self, it):
+        self.table.remove(it)
+        self.filtered = [x for x in self.filtered if x is not it]
+        self.view.set_rows(self.filtered)
+
+    def clear_search(self):
+        self.search_var.set('')
+        self.run_search()
+
+    def refresh_tree(self):
+        self.view.set_rows(self.filtered)
+
+    def sort_by(self, col, add=False):
+        """Клік — сортувати за стовпцем (повторний клік розвертає порядок),
+        Shift+клік — додати стовпець як додатковий ключ."""
+        keys = list(self.sort_keys)
+        pos = next((i for i, (c, _) in enumerate(keys) if c == col), None)
+        if pos is not None and (add or pos == 0):
+            keys[pos] = (col, not keys[pos][1])
+        elif add:
+            keys.append((col, False))
+        else:
+            keys = [(col, False)]
+        self.sort_keys = keys
+        self.run_search()
+        self.set_status("Сортування: " + ", ".join(f"{c} {'спадання' if r else 'зростання'}" for c, r in keys))
+
+    def on_shift_click(self, e, cols):
+        if self.tree.identify_region(e.x, e.y) != 'heading':
+            return
+        n = int(self.tree.identify_column(e.x)[1:])
+        if 1 <= n <= len(cols):
+            self.sort_by(cols[n-1], add=True)
+        return 'break'
+
+    def sorted_items(self):
+        if not self.sort_keys:
+            return self.items
+        return self.table.items(self.table.order(self.sort_keys))
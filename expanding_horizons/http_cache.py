@@ -0,0 +1,65 @@
+import json, threading
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from export import compress
+import metrics
+
+def make_etag(*parts):
+    """ETag з версії даних і ознак представлення (формат, стиснення); порожні частини пропускаються."""
+    return '"' + '-'.join(str(p) for p in parts if p not in (None, '')) + '"'
+
+def not_modified(if_none_match, if_modified_since, etag, modified):
+    """Чи збігається збережена клієнтом копія (If-None-Match має перевагу над If-Modified-Since)."""
+    if if_none_match:
+        return if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]
+    if if_modified_since:
+        try:
+            return int(modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+class JsonCache:
+    """Готові (і, за потреби, стиснені) JSON-байти відповідей, поки не змінилась версія даних.
+
+    Усі записи належать одній (найновішій) версії: перший промах новішої версії
+    скидає їх разом, а відповідь, побудована для старішої, не зберігається.
+    Розмір обмежено max_bytes і max_entries, найдавніше використані йдуть першими.
+    """
+
+    def __init__(self, max_bytes, max_entries=1024):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # ключ -> (тіло, заголовки)
+        self._seq = None               # версія даних усіх записів
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, seq, encoding, etag, build):
+        """(тіло, заголовки); build() -> (об'єкт, заголовки) викликається лише при промаху."""
+        with self._lock:
+            hit = self._entries.get(key) if seq == self._seq else None
+            if hit is not None:
+                self._entries.move_to_end(key)
+                return hit
+        obj, headers = build()
+        with metrics.timed("inventory_stage_seconds", stage="serialize"):
+            body = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+            if encoding:
+                body = b"".join(compress([body], encoding))
+        headers = dict(headers, ETag=etag, Vary="Accept-Encoding")
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        with self._lock:
+            if self._seq is None or seq > self._seq:
+                self._entries.clear()
+                self._seq, self._bytes = seq, 0
+            if seq == self._seq:
+                old = self._entries.pop(key, None)
+                if old is not None:
+                    self._bytes -= len(old[0])
+                self._entries[key] = (body, headers)
+                self._bytes += len(body)
+                while len(self._entries) > 1 and (self._bytes > self.max_bytes or len(self._entries) > self.max_entries):
+                    self._bytes -= len(self._entries.popitem(last=False)[1][0])
+        return body, headers
@@ -0,0 +1,104 @@
+"""Метрики сервера у текстовому форматі Prometheus і профілювання окремих запитів.
+
+Лічильники та гістограми живуть у пам'яті процесу; /metrics віддає render().
+Профілювання вмикається змінною INVENTORY_PROFILING=1, після чого запит
+із заголовком X-Profile: 1 отримує замість відповіді звіт cProfile.
+"""
+import cProfile, io, os, pstats, threading, time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PROFILING = os.environ.get("INVENTORY_PROFILING") == "1"
+PROFILE_LINES = 60
+
+HELP = {
+    "inventory_request_seconds": ("histogram", "Час обробки запиту за маршрутом"),
+    "inventory_requests_total": ("counter", "Кількість запитів за маршрутом і статусом"),
+    "inventory_stage_seconds": ("histogram", "Час етапів: load, validate, serialize, save"),
+    "inventory_rows_read_total": ("counter", "Рядки, прочитані зі сховища для відповідей"),
+    "inventory_rows_written_total": ("counter", "Рядки, зафіксовані у сховищі"),
+    "inventory_bytes_serialized_total": ("counter", "Байти тіл відповідей (після серіалізації й стиснення)"),
+}
+
+_lock = threading.Lock()
+_counters = {}    # (ім'я, мітки) -> значення
+_histograms = {}  # (ім'я, мітки) -> [кошики..., сума, кількість]
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def inc(name, n=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + n
+
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [0] * (len(BUCKETS) + 3)
+        h[bisect_left(BUCKETS, seconds)] += 1  # останній кошик — +Inf
+        h[-2] += seconds
+        h[-1] += 1
+
+@contextmanager
+def timed(name, **labels):
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t, **labels)
+
+def counted(chunks, **labels):
+    """Пропускає потік байтів, рахуючи inventory_bytes_serialized_total."""
+    for chunk in chunks:
+        inc("inventory_bytes_serialized_total", len(chunk), **labels)
+        yield chunk
+
+def _labels(pairs, extra=()):
+    pairs = tuple(pairs) + tuple(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join('%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs) + "}"
+
+def render():
+    """Текст для /metrics (формат експозиції Prometheus 0.0.4)."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: list(v) for k, v in _histograms.items()}
+    out = []
+    for name, (kind, text) in HELP.items():
+        out.append(f"# HELP {name} {text}")
+        out.append(f"# TYPE {name} {kind}")
+        if kind == "counter":
+            for (n, labels), v in sorted(counters.items()):
+                if n == name:
+                    out.append(f"{name}{_labels(labels)} {v}")
+            continue
+        for (n, labels), h in sorted(histograms.items()):
+            if n != name:
+                continue
+            total = 0
+            for le, count in zip(BUCKETS + ("+Inf",), h):
+                total += count
+                out.append(f"{name}_bucket{_labels(labels, [('le', le)])} {total}")
+            out.append(f"{name}_sum{_labels(labels)} {h[-2]:.6f}")
+            out.append(f"{name}_count{_labels(labels)} {h[-1]}")
+    return "\n".join(out) + "\n"
+
+def start_profile(header):
+    """cProfile.Profile, якщо профілювання дозволене й запитане заголовком X-Profile, інакше None."""
+    if not PROFILING or header not in ("1", "true"):
+        return None
+    prof = cProfile.Profile()
+    prof.enable()
+    return prof
+
+def profile_report(prof, status):
+    prof.disable()
+    buf = io.StringIO()
+    buf.write(f"# статус відповіді: {status}\n")
+    pstats.Stats(prof, stream=buf).sort_stats("cumulative").print_stats(PROFILE_LINES)
+    return buf.getvalue().encode("utf-8")
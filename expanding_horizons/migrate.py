@@ -0,0 +1,31 @@
+"""Переносить дані з CSV-сховища (разом із ще не злитим журналом) у SQLite.
+
+    python migrate.py [data/inventory.csv] [data/inventory.db]
+
+Після перенесення сервер запускається з INVENTORY_STORAGE=sqlite.
+Нумерація змін продовжується з CSV, тож клієнти просто отримають reset у /changes.
+"""
+import sys, os
+from storage import CsvStorage, SqliteStorage
+from validation import FIELDS
+
+def migrate(csv_path, db_path, fields=FIELDS):
+    src = CsvStorage(csv_path, fields)
+    dst = SqliteStorage(db_path, fields)
+    try:
+        rows = src.all()
+        conn = dst._conn()
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('seq', ?)", (max(src.seq, dst.seq),))
+        dst.replace_all(rows)
+        return len(rows)
+    finally:
+        src.close()
+        dst.close()
+
+if __name__ == "__main__":
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else "data/inventory.csv"
+    db_path = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(csv_path)[0] + ".db"
+    if not os.path.exists(csv_path):
+        sys.exit(f"Файл не знайдено: {csv_path}")
+    n = migrate(csv_path, db_path)
+    print(f"Перенесено {n} записів у {db_path}")
@@ -0,0 +1,86 @@
+MAX_LIMIT = 5000
+
+RANGES = {
+    'min_quantity': ('quantity', int, lambda v, b: v >= b),
+    'max_quantity': ('quantity', int, lambda v, b: v <= b),
+    'min_price': ('price', float, lambda v, b: v >= b),
+    'max_price': ('price', float, lambda v, b: v <= b),
+}
+
+def parse_query(args, fields):
+    """Розбирає параметри GET /items. Повертає (запит, None) або (None, помилка)."""
+    q = {
+        'eq': {'category': args.get('category'), 'location': args.get('location')},
+        'name': args.get('name', '').strip().lower(),
+        'search': args.get('q', '').strip().lower(),
+        'ranges': [],
+        'after': -1,
+        'limit': None,
+        'fields': None,
+    }
+    for arg, (field, conv, cmp) in RANGES.items():
+        if args.get(arg) in (None, ''):
+            continue
+        try:
+            bound = conv(str(args[arg]).replace(',', '.'))
+        except ValueError:
+            return None, f"Invalid {arg}"
+        q['ranges'].append((field, conv, cmp, bound))
+    if args.get('cursor'):
+        try:
+            q['after'] = int(args['cursor'])
+        except ValueError:
+            return None, "Invalid cursor"
+    if args.get('limit'):
+        try:
+            q['limit'] = int(args['limit'])
+            if q['limit'] <= 0:
+                raise ValueError
+        except ValueError:
+            return None, "limit must be integer > 0"
+        q['limit'] = min(q['limit'], MAX_LIMIT)
+    if args.get('fields'):
+        wanted = [f.strip() for f in args['fields'].split(',') if f.strip()]
+        unknown = [f for f in wanted if f not in fields]
+        if unknown:
+            return None, "Unknown fields: " + ",".join(unknown)
+        q['fields'] = wanted
+    return q, None
+
+def _matches(row, q):
+    if q['name'] and q['name'] not in row['name'].lower():
+        return False
+    if q['search'] and q['search'] not in row['name'].lower() and q['search'] not in row['category'].lower():
+        return False
+    for field, conv, cmp, bound in q['ranges']:
+        try:
+            if not cmp(conv(row.get(field) or 0), bound):
+                return False
+        except ValueError:
+            return False
+    return True
+
+def run_query(store, q):
+    """Повертає (сторінка, курсор наступної сторінки або None)."""
+    page = []
+    limit = q['limit']
+    for pos, row in store.scan(q['after'], **q['eq']):
+        if not _matches(row, q):
+            continue
+        if limit is not None and len(page) == limit:
+            return page, str(last)
+        page.append(row if q['fields'] is None else {f: row.get(f, '') for f in q['fields']})
+        last = pos
+    return page, None
+
+def changes_page(store, since, limit):
+    """Тіло відповіді /changes: {"seq", "changes", "more"} або {"seq", "reset": true}."""
+    seq, found = store.changes(since, limit + 1)
+    if found is None:
+        return {"seq": seq, "reset": True}
+    more = len(found) > limit
+    changes = []
+    for n, item_id, row in found[:limit]:
+        changes.append(dict(row, seq=n) if row is not None else {"id": item_id, "deleted": True, "seq": n})
+    last = changes[-1]["seq"] if changes else since
+    return {"seq": seq if not more else last, "changes": changes, "more": more}
@@ -0,0 +1,87 @@
+import json, mmap, os, struct, sys
+from array import array
+
+MAGIC = b'INVSNAP1'
+ALIGN = 8
+
+def _encode_column(vals):
+    """Колонка рядків -> (опис, байти). Колонки з невеликою кількістю різних
+    значень (категорія, місцезнаходження) зберігаються як словник + коди."""
+    uniq = dict.fromkeys(vals)
+    if len(uniq) <= max(256, len(vals) // 4):
+        code = {v: i for i, v in enumerate(uniq)}
+        data = array('I', map(code.__getitem__, vals))
+        if sys.byteorder == 'big':
+            data.byteswap()
+        return {'kind': 'dict', 'values': list(uniq)}, data.tobytes()
+    blob = '\x00'.join(vals)
+    if blob.count('\x00') != len(vals) - 1:
+        return {'kind': 'json'}, json.dumps(vals, ensure_ascii=False).encode('utf-8')
+    return {'kind': 'str'}, blob.encode('utf-8')
+
+def write(path, items, fields, versions, meta):
+    """Пише колонковий знімок атомарно (тимчасовий файл + os.replace).
+
+    Формат: MAGIC, u32 довжина заголовка, JSON-заголовок (meta, кількість рядків,
+    опис колонок зі зміщеннями), далі секції колонок, вирівняні на 8 байт.
+    Числа — little-endian, тож секції можна читати прямо з mmap.
+    """
+    n = len(items)
+    columns, sections, pos = [], [], 0
+    for f in fields:
+        desc, data = _encode_column([str(it.get(f, '')) for it in items])
+        columns.append(dict(desc, name=f))
+        sections.append(data)
+    vers = array('q', (versions.get(it['id'], -1) for it in items))
+    if sys.byteorder == 'big':
+        vers.byteswap()
+    columns.append({'name': 'version', 'kind': 'i64'})
+    sections.append(vers.tobytes())
+    for desc, data in zip(columns, sections):
+        desc['offset'], desc['length'] = pos, len(data)
+        pos += -(-len(data) // ALIGN) * ALIGN
+    header = json.dumps({'meta': meta, 'rows': n, 'columns': columns}, ensure_ascii=False).encode('utf-8')
+    header += b' ' * (-(len(MAGIC) + 4 + len(header)) % ALIGN)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(header)) + header)
+        for data in sections:
+            f.write(data)
+            f.write(b'\x00' * (-len(data) % ALIGN))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def read(path, fields):
+    """Повертає (meta, рядки-словники, версії {id: номер}).
+
+    Однакові значення колонок-словників — це один і той самий об'єкт str,
+    тому категорії та місцезнаходження не дублюються в пам'яті.
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:len(MAGIC)] != MAGIC:
+            raise ValueError("Невідомий формат знімка кешу")
+        hlen, = struct.unpack_from('<I', mm, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(mm[start:start + hlen].decode('utf-8'))
+        base = start + hlen
+        n = header['rows']
+        cols = {}
+        for desc in header['columns']:
+            a = base + desc['offset']
+            data = mm[a:a + desc['length']]
+            if desc['kind'] in ('dict', 'i64'):
+                arr = array('I' if desc['kind'] == 'dict' else 'q')
+                arr.frombytes(data)
+                if sys.byteorder == 'big':
+                    arr.byteswap()
+                col = list(map(desc['values'].__getitem__, arr)) if desc['kind'] == 'dict' else arr
+            elif desc['kind'] == 'json':
+                col = json.loads(data.decode('utf-8'))
+            else:
+                col = data.decode('utf-8').split('\x00') if n else []
+            cols[desc['name']] = col
+    items = [dict(zip(fields, row)) for row in zip(*(cols.get(f) or [''] * n for f in fields))]
+    vers = cols.get('version') or ()
+    versions = {it['id']: v for it, v in zip(items, vers) if v >= 0}
+    return header['meta'], items, versions
@@ -0,0 +1,669 @@
+import csv, json, os, threading, bisect, time, sqlite3, weakref
+from collections import OrderedDict
+from abc import ABC, abstractmethod
+
+class Storage(ABC):
+    """Сховище товарів: читання з пам'яті, запис по одному рядку."""
+
+    seq = 0          # номер останньої зміни
+    modified = 0.0   # час останньої зміни (epoch), для Last-Modified
+
+    @abstractmethod
+    def all(self) -> list:
+        pass
+
+    @abstractmethod
+    def get(self, item_id):
+        pass
+
+    @abstractmethod
+    def put(self, item):
+        pass
+
+    @abstractmethod
+    def delete(self, item_id) -> bool:
+        pass
+
+    @abstractmethod
+    def replace_all(self, items):
+        pass
+
+    @abstractmethod
+    def batch(self):
+        pass
+
+    @abstractmethod
+    def version(self, item_id):
+        """Номер останньої зміни рядка (і для надгробка), None — рядок невідомий."""
+        pass
+
+    @abstractmethod
+    def changes(self, since, limit=None):
+        """Зміни з номером > since: (поточний seq, [(seq, id, рядок або None)]).
+        Якщо історія до since вже відкинута — (поточний seq, None)."""
+        pass
+
+    @abstractmethod
+    def scan(self, after=-1, **eq):
+        """Пари (позиція, рядок) у порядку вставки, позиція > after.
+        eq — точні збіги за індексованими полями (без урахування регістру)."""
+        pass
+
+    def compact(self):
+        pass
+
+    def close(self):
+        self.compact()
+
+
+class CsvBatch:
+    """Набір змін поверх індексу, що фіксується одним fsync."""
+
+    def __init__(self, store):
+        self.store = store
+        self.changes = {}  # id -> рядок або None (видалено)
+        self.cleared = False
+        self.records = []
+
+    def get(self, item_id):
+        if item_id in self.changes:
+            return self.changes[item_id]
+        if self.cleared:
+            return None
+        return self.store._rows.get(item_id)
+
+    def version(self, item_id):
+        if item_id in self.changes:
+            return self.store.seq + 1  # номер ще не присвоєно, але він точно новіший
+        return self.store.version(item_id)
+
+    def put(self, item):
+        item = {k: item.get(k, '') for k in self.store.fields}
+        self.changes[item['id']] = item
+        self.records.append({'op': 'put', 'item': item})
+        return item
+
+    def delete(self, item_id):
+        if self.get(item_id) is None:
+            return False
+        self.changes[item_id] = None
+        self.records.append({'op': 'delete', 'id': item_id})
+        return True
+
+    def clear(self):
+        self.changes = {}
+        self.cleared = True
+        self.records.append({'op': 'clear'})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.store._commit(self)
+
+
+class CsvStorage(Storage):
+    """CSV як знімок + журнал змін (WAL), який періодично зливається назад у CSV.
+
+    Індекс id -> рядок тримається в пам'яті, тому запис одного товару
+    це лише один рядок у журналі, а не перезапис усього файлу.
+    Читання йдуть з опублікованого знімка і не чекають на записи.
+    Для category та location тримаються вторинні індекси значення -> відсортований
+    список позицій, тож сторінка з фільтром починається бісекцією від курсора.
+
+    Кожен запис журналу має зростаючий номер seq. Для рядків, змінених після
+    floor, пам'ятається номер останньої зміни (для видалених — надгробок);
+    це зберігається в .meta.json під час злиття, щоб /changes пережив рестарт.
+
+    Злиття не тримає записи: під замком журнал лише перейменовується на
+    .wal.old, а знімок пишеться у фоновому потоці; .wal.old видаляється
+    після заміни CSV і .meta.json, до того load() читає обидва сегменти.
+    """
+
+    INDEXED = ('category', 'location')
+    MAX_RECENT = 50000
+    SCAN_CHUNK = 256  # рядків scan за одне захоплення замка
+
+    def __init__(self, path, fields, wal_path=None, compact_every=1000):
+        self.path = path
+        self.fields = fields
+        base = os.path.splitext(path)[0]
+        self.wal_path = wal_path or base + ".wal"
+        self.old_wal_path = self.wal_path + ".old"
+        self.meta_path = base + ".meta.json"
+        self.compact_every = compact_every
+        self.seq = 0
+        self.floor = 0
+        self._seqs = OrderedDict()  # id -> seq останньої зміни, від старих до нових
+        self._rows = {}
+        self._pos = {}
+        self._ids = {}  # позиція -> id
+        self._next_pos = 0
+        self._index = {f: {} for f in self.INDEXED}
+        self._wal = None
+        self._wal_count = 0
+        self._snapshot = None
+        self._lock = threading.RLock()
+        self._compacting = threading.Lock()  # одне злиття за раз, фонове чи явне
+        self.load()
+
+    def load(self):
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        if not os.path.exists(self.path):
+            self._write_snapshot([])
+        self._clear()
+        with open(self.path, 'r', newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                self._set({k: row.get(k, '') for k in self.fields})
+        self.seq = self.floor = 0
+        self._seqs = OrderedDict()
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            self.seq = meta.get('seq', 0)
+            self.floor = meta.get('floor', 0)
+            self._seqs = OrderedDict(meta.get('recent', []))
+        base_seq = self.seq
+        self._wal_count = 0
+        segments = (self.old_wal_path, self.wal_path)  # .old лишається, якщо фонове злиття не завершилось
+        self.modified = max(os.path.getmtime(p) for p in (self.path, self.meta_path) + segments if os.path.exists(p))
+        for path in segments:
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # обірваний останній запис після аварії
+                    rec.setdefault('seq', self.seq + 1)
+                    self._wal_count += 1
+                    if rec['seq'] > base_seq:  # інакше вже є у знімку
+                        self._replay(rec)
+        self._snapshot = None
+        self._wal = open(self.wal_path, 'a', encoding='utf-8')
+
+    def batch(self):
+        return CsvBatch(self)
+
+    def _replay(self, rec):
+        seq = rec['seq']
+        if rec['op'] == 'put':
+            self._set(rec['item'])
+            item_id = rec['item']['id']
+        elif rec['op'] == 'delete':
+            self._remove(rec['id'])
+            item_id = rec['id']
+        else:
+            self._clear()
+            self._seqs.clear()
+            self.floor = seq
+            item_id = None
+        if item_id is not None and seq > self._seqs.get(item_id, self.floor):
+            self._seqs[item_id] = seq
+            self._seqs.move_to_end(item_id)
+        self.seq = max(self.seq, seq)
+
+    @staticmethod
+    def _key(value):
+        return str(value).strip().lower()
+
+    def _clear(self):
+        self._rows = {}
+        self._pos = {}
+        self._ids = {}
+        self._index = {f: {} for f in self.INDEXED}
+
+    def _set(self, item):
+        item_id = item['id']
+        old = self._rows.get(item_id)
+        if old is None:
+            # нова позиція більша за всі наявні, тож списки індексів лишаються впорядкованими
+            pos = self._pos[item_id] = self._next_pos
+            self._next_pos += 1
+            self._ids[pos] = item_id
+            for f in self.INDEXED:
+                self._index[f].setdefault(self._key(item.get(f, '')), []).append(pos)
+        else:
+            pos = self._pos[item_id]
+            for f in self.INDEXED:
+                key = self._key(item.get(f, ''))
+                if key != self._key(old.get(f, '')):
+                    self._unindex(f, old, pos)
+                    bisect.insort(self._index[f].setdefault(key, []), pos)
+        self._rows[item_id] = item
+
+    def _remove(self, item_id):
+        old = self._rows.pop(item_id, None)
+        if old is not None:
+            pos = self._pos.pop(item_id)
+            del self._ids[pos]
+            for f in self.INDEXED:
+                self._unindex(f, old, pos)
+
+    def _unindex(self, f, item, pos):
+        key = self._key(item.get(f, ''))
+        positions = self._index[f].get(key)
+        if positions is not None:
+            i = bisect.bisect_left(positions, pos)
+            if i < len(positions) and positions[i] == pos:
+                del positions[i]
+            if not positions:
+                del self._index[f][key]
+
+    def _commit(self, batch):
+        if not batch.records:
+            return
+        with self._lock:
+            for i, rec in enumerate(batch.records, self.seq + 1):
+                rec['seq'] = i
+            self._wal.write(''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in batch.records))
+            self._wal.flush()
+            os.fsync(self._wal.fileno())
+            self._wal_count += len(batch.records)
+            for rec in batch.records:
+                self._replay(rec)
+            self._snapshot = None
+            self.modified = time.time()
+            if self._wal_count >= self.compact_every and self._compacting.acquire(blocking=False):
+                threading.Thread(target=self._flush, args=self._rotate(), name="csv-compact", daemon=True).start()
+
+    def _snap(self):
+        snap = self._snapshot
+        if snap is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = (list(self._rows.values()), list(self._pos.values()))
+                snap = self._snapshot
+        return snap
+
+    def all(self):
+        """Узгоджений знімок усіх рядків; список не можна змінювати."""
+        return self._snap()[0]
+
+    def scan(self, after=-1, **eq):
+        eq = {f: self._key(v) for f, v in eq.items() if v is not None and v != ''}
+        if not eq:
+            rows, positions = self._snap()
+            start = bisect.bisect_right(positions, after)
+            for i in range(start, len(rows)):
+                yield positions[i], rows[i]
+            return
+        # під замком лише бісекція і копія шматка найкоротшого списку;
+        # решта фільтрів перевіряється вже без замка (рядки не змінюються на місці)
+        while True:
+            with self._lock:
+                lists = [self._index[f].get(v) for f, v in eq.items()]
+                if not all(lists):
+                    return
+                positions = min(lists, key=len)
+                start = bisect.bisect_right(positions, after)
+                chunk = [(p, self._rows[self._ids[p]]) for p in positions[start:start + self.SCAN_CHUNK]]
+            if not chunk:
+                return
+            for pos, row in chunk:
+                if all(self._key(row.get(f, '')) == v for f, v in eq.items()):
+                    yield pos, row
+            after = chunk[-1][0]
+
+    def get(self, item_id):
+        return self._rows.get(item_id)
+
+    def version(self, item_id):
+        if item_id in self._seqs:
+            return self._seqs[item_id]
+        return self.floor if item_id in self._rows else None
+
+    def changes(self, since, limit=None):
+        with self._lock:
+            if since < self.floor:
+                return self.seq, None
+            found = []
+            for item_id in reversed(self._seqs):
+                seq = self._seqs[item_id]
+                if seq <= since:
+                    break
+                found.append((seq, item_id, self._rows.get(item_id)))
+            seq = self.seq
+        found.reverse()
+        if limit is not None:
+            found = found[:limit]
+        return seq, found
+
+    def put(self, item):
+        with self.batch() as b:
+            return b.put(item)
+
+    def delete(self, item_id):
+        with self.batch() as b:
+            return b.delete(item_id)
+
+    def replace_all(self, items):
+        with self.batch() as b:
+            b.clear()
+            for it in items:
+                b.put(it)
+
+    def _write_snapshot(self, rows):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', newline='', encoding='utf-8') as f:
+            w = csv.DictWriter(f, fieldnames=self.fields)
+            w.writeheader()
+            for row in rows:
+                w.writerow(row)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def _rotate(self):
+        """Під замком: фіксує стан для знімка й починає новий журнал.
+
+        Повертає (рядки, мета) для _flush; старий сегмент лежить у .wal.old.
+        """
+        with self._lock:
+            while len(self._seqs) > self.MAX_RECENT:
+                _, self.floor = self._seqs.popitem(last=False)
+            meta = {'seq': self.seq, 'floor': self.floor, 'recent': list(self._seqs.items())}
+            rows = self._snap()[0]
+            self._wal.close()
+            if os.path.exists(self.old_wal_path):  # попереднє злиття не завершилось
+                with open(self.wal_path, 'r', encoding='utf-8') as src, open(self.old_wal_path, 'a', encoding='utf-8') as dst:
+                    dst.write(src.read())
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                os.remove(self.wal_path)
+            else:
+                os.replace(self.wal_path, self.old_wal_path)
+            self._wal = open(self.wal_path, 'w', encoding='utf-8')
+            self._wal_count = 0
+        return rows, meta
+
+    def _flush(self, rows, meta):
+        """Пише знімок і .meta.json поза замком, потім прибирає старий сегмент."""
+        try:
+            self._write_snapshot(rows)
+            tmp = self.meta_path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.meta_path)
+            os.remove(self.old_wal_path)
+        finally:
+            self._compacting.release()
+
+    def compact(self):
+        """Зливає журнал у CSV (атомарно через тимчасовий файл) і очищає журнал.
+
+        Чекає на фонове злиття, якщо воно триває.
+        """
+        self._compacting.acquire()
+        with self._lock:
+            if self._wal_count == 0 and not os.path.exists(self.old_wal_path):
+                self._compacting.release()
+                return
+            job = self._rotate()
+        self._flush(*job)
+
+    def close(self):
+        self.compact()
+        self._wal.close()
+
+
+class SqliteBatch:
+    """Транзакція на з'єднанні записувача; номери змін видаються одразу."""
+
+    def __init__(self, store):
+        self.store = store
+        self.conn = store._conn()
+        self.conn.execute("BEGIN IMMEDIATE")
+        self.seq = store._meta(self.conn, 'seq')
+        self.floor = None
+        self.records = []
+
+    def _next(self, rec):
+        self.seq += 1
+        rec['seq'] = self.seq
+        self.records.append(rec)
+        return self.seq
+
+    def get(self, item_id):
+        return self.store._get(self.conn, item_id)
+
+    def version(self, item_id):
+        return self.store._version(self.conn, item_id)
+
+    def put(self, item):
+        store = self.store
+        item = {k: item.get(k, '') for k in store.fields}
+        seq = self._next({'op': 'put', 'item': item})
+        keys = [store._key(item.get(f, '')) for f in store.INDEXED]
+        self.conn.execute(store._sql_put, [item[f] for f in store.fields] + keys + [seq])
+        self.conn.execute("DELETE FROM tombstones WHERE id = ?", (item['id'],))
+        return item
+
+    def delete(self, item_id):
+        if not self.conn.execute("DELETE FROM items WHERE id = ?", (item_id,)).rowcount:
+            return False
+        seq = self._next({'op': 'delete', 'id': item_id})
+        self.conn.execute("INSERT OR REPLACE INTO tombstones (id, seq) VALUES (?, ?)", (item_id, seq))
+        return True
+
+    def clear(self):
+        self.floor = self._next({'op': 'clear'})
+        self.conn.execute("DELETE FROM items")
+        self.conn.execute("DELETE FROM tombstones")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None or not self.records:
+            self.conn.execute("ROLLBACK")
+            return
+        meta = [('seq', self.seq), ('modified', time.time())]
+        if self.floor is not None:
+            meta.append(('floor', self.floor))
+        self.conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", meta)
+        self.conn.execute("COMMIT")
+
+
+class _ThreadConn:
+    """З'єднання одного потоку; на нього тримає посилання лише threading.local."""
+
+    __slots__ = ('conn', '__weakref__')
+
+    def __init__(self, conn):
+        self.conn = conn
+
+
+class SqliteStorage(Storage):
+    """SQLite у режимі WAL: транзакційні записи та індексовані запити без тримання всього в пам'яті.
+
+    Кожен потік має власне з'єднання (пул на потік), яке закривається разом
+    із потоком — Flask запускає потік на запит; SQL-рядки сталі, тож
+    sqlite3 бере вже підготовлені запити з кешу з'єднання. Номер зміни зберігається
+    в самому рядку, видалені id — у tombstones, тому /changes працює так само,
+    як у CsvStorage. seq і час зміни читаються з бази, тож кілька процесів
+    сервера над одним файлом бачать зміни одне одного.
+    """
+
+    INDEXED = CsvStorage.INDEXED
+    MAX_RECENT = CsvStorage.MAX_RECENT
+
+    def __init__(self, path, fields):
+        self.path = path
+        self.fields = fields
+        self._local = threading.local()
+        self._holders = weakref.WeakSet()  # живі з'єднання потоків, для close()
+        self._lock = threading.Lock()
+        self._snapshot = None
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        cols = ', '.join(f'"{f}"' for f in fields)
+        keys = ', '.join(f'{f}_key' for f in self.INDEXED)
+        self._cols = cols
+        self._sql_put = (
+            f'INSERT INTO items ({cols}, {keys}, seq) VALUES ({", ".join("?" * (len(fields) + len(self.INDEXED) + 1))}) '
+            f'ON CONFLICT(id) DO UPDATE SET '
+            + ', '.join(f'{c} = excluded.{c}' for c in [f'"{f}"' for f in fields if f != 'id']
+                        + [f'{f}_key' for f in self.INDEXED] + ['seq']))
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS items (
+                pos INTEGER PRIMARY KEY AUTOINCREMENT,
+                {', '.join(f'"{f}" TEXT NOT NULL DEFAULT ""' + (' UNIQUE' if f == 'id' else '') for f in fields)},
+                {', '.join(f'{f}_key TEXT NOT NULL' for f in self.INDEXED)},
+                seq INTEGER NOT NULL
+            );
+            {''.join(f'CREATE INDEX IF NOT EXISTS items_{f} ON items ({f}_key, pos);' for f in self.INDEXED)}
+            CREATE INDEX IF NOT EXISTS items_seq ON items (seq);
+            CREATE TABLE IF NOT EXISTS tombstones (id TEXT PRIMARY KEY, seq INTEGER NOT NULL);
+            CREATE INDEX IF NOT EXISTS tombstones_seq ON tombstones (seq);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+        """)
+
+    def _conn(self):
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, cached_statements=64)
+            conn.execute("PRAGMA synchronous = FULL")
+            conn.execute("PRAGMA busy_timeout = 5000")
+            holder = self._local.holder = _ThreadConn(conn)
+            # threading.local звільняє holder, коли потік завершується, — тоді й закриваємо
+            weakref.finalize(holder, conn.close)
+            with self._lock:
+                self._holders.add(holder)
+        return holder.conn
+
+    @staticmethod
+    def _key(value):
+        return str(value).strip().lower()
+
+    @staticmethod
+    def _meta(conn, key, default=0):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    @property
+    def seq(self):
+        return self._meta(self._conn(), 'seq')
+
+    @property
+    def modified(self):
+        return self._meta(self._conn(), 'modified', 0.0)
+
+    @property
+    def floor(self):
+        return self._meta(self._conn(), 'floor')
+
+    def batch(self):
+        return SqliteBatch(self)
+
+    def _get(self, conn, item_id):
+        row = conn.execute(f"SELECT {self._cols} FROM items WHERE id = ?", (item_id,)).fetchone()
+        return dict(zip(self.fields, row)) if row else None
+
+    def _version(self, conn, item_id):
+        row = conn.execute("SELECT seq FROM items WHERE id = ? UNION ALL SELECT seq FROM tombstones WHERE id = ?",
+                           (item_id, item_id)).fetchone()
+        return row[0] if row else None
+
+    def get(self, item_id):
+        return self._get(self._conn(), item_id)
+
+    def version(self, item_id):
+        return self._version(self._conn(), item_id)
+
+    def all(self):
+        """Усі рядки; список кешується до наступної зміни і не повинен змінюватись."""
+        conn = self._conn()
+        snap = self._snapshot
+        if snap is None or snap[0] != self._meta(conn, 'seq'):
+            conn.execute("BEGIN")
+            try:
+                seq = self._meta(conn, 'seq')
+                rows = [dict(zip(self.fields, r)) for r in conn.execute(f"SELECT {self._cols} FROM items ORDER BY pos")]
+            finally:
+                conn.execute("COMMIT")
+            self._snapshot = snap = (seq, rows)
+        return snap[1]
+
+    def scan(self, after=-1, **eq):
+        eq = {f: self._key(v) for f, v in eq.items() if v is not None and v != ''}
+        where = ''.join(f' AND {f}_key = ?' for f in eq)
+        cur = self._conn().execute(f"SELECT pos, {self._cols} FROM items WHERE pos > ?{where} ORDER BY pos",
+                                   [after] + list(eq.values()))
+        while True:
+            rows = cur.fetchmany(500)
+            if not rows:
+                return
+            for r in rows:
+                yield r[0], dict(zip(self.fields, r[1:]))
+
+    def changes(self, since, limit=None):
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            seq, floor = self._meta(conn, 'seq'), self._meta(conn, 'floor')
+            if since < floor:
+                return seq, None
+            cur = conn.execute(
+                f"SELECT seq, id, 1, {self._cols} FROM items WHERE seq > ? "
+                f"UNION ALL SELECT seq, id, 0, {', '.join('NULL' for _ in self.fields)} FROM tombstones WHERE seq > ? "
+                f"ORDER BY seq LIMIT ?", (since, since, -1 if limit is None else limit))
+            found = [(r[0], r[1], dict(zip(self.fields, r[3:])) if r[2] else None) for r in cur]
+        finally:
+            conn.execute("COMMIT")
+        return seq, found
+
+    def put(self, item):
+        with self.batch() as b:
+            return b.put(item)
+
+    def delete(self, item_id):
+        with self.batch() as b:
+            return b.delete(item_id)
+
+    def replace_all(self, items):
+        with self.batch() as b:
+            b.clear()
+            for it in items:
+                b.put(it)
+
+    def compact(self):
+        """Відкидає найстаріші надгробки понад MAX_RECENT (піднімаючи floor) і зливає WAL у базу."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT seq FROM tombstones ORDER BY seq DESC LIMIT 1 OFFSET ?", (self.MAX_RECENT,)).fetchone()
+            if row:
+                conn.execute("DELETE FROM tombstones WHERE seq <= ?", (row[0],))
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('floor', ?)",
+                             (max(row[0], self._meta(conn, 'floor')),))
+        finally:
+            conn.execute("COMMIT")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        self.compact()
+        with self._lock:
+            holders = list(self._holders)
+            self._holders = weakref.WeakSet()
+        for holder in holders:
+            holder.conn.close()
+        self._local = threading.local()
+
+
+def get_storage(data_file, fields):
+    backend = os.environ.get("INVENTORY_STORAGE", "csv")
+    if backend == "csv":
+        return CsvStorage(data_file, fields)
+    if backend == "sqlite":
+        return SqliteStorage(os.environ.get("INVENTORY_DB") or os.path.splitext(data_file)[0] + ".db", fields)
+    raise ValueError(f"Невідоме сховище: {backend}")
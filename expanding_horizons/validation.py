@@ -0,0 +1,149 @@
+import uuid
+from datetime import datetime
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+FIELDS = ['id','name','category','quantity','price','location','created_at']
+
+ERRORS = {
+    "row": "Invalid JSON body",
+    "id": "Missing id",
+    "duplicate": "Duplicate id",
+    "name": "Invalid name",
+    "category": "Invalid category",
+    "quantity": "Quantity must be integer >= 0",
+    "price": "Price must be number >= 0",
+}
+
+def _text(v):
+    return str(v).strip()
+
+def _quantity(v):
+    """Кількість -> рядок цілого >= 0 або None. Одне правило для validate_item і validate_rows."""
+    try:
+        q = int(v)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return str(q) if q >= 0 else None
+
+def _price(v):
+    """Ціна з комою або крапкою -> '0.00' або None для неправильних, від'ємних і нескінченних."""
+    try:
+        p = float(str(v).replace(',', '.'))
+    except ValueError:
+        return None
+    return f"{p:.2f}" if 0 <= p < float("inf") else None
+
+def validate_item(data, require_id=False):
+    if not isinstance(data, dict):
+        return None, ERRORS["row"]
+
+    out = {}
+
+    if require_id:
+        out["id"] = str(data.get("id") or "")
+        if not out["id"].strip():
+            return None, ERRORS["id"]
+    else:
+        out["id"] = str(uuid.uuid4())
+
+    for f in ("name", "category"):
+        out[f] = _text(data.get(f, ""))
+        if not out[f]:
+            return None, ERRORS[f]
+
+    out["quantity"] = _quantity(data.get("quantity", 0))
+    if out["quantity"] is None:
+        return None, ERRORS["quantity"]
+
+    out["price"] = _price(data.get("price", "0"))
+    if out["price"] is None:
+        return None, ERRORS["price"]
+
+    out["location"] = _text(data.get("location", ""))
+
+    out["created_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return out, None
+
+def _strings(col):
+    """Колонка значень -> обрізані рядки (масив NumPy або список)."""
+    if np is not None:
+        return np.char.strip(np.array([str(v) for v in col], dtype=str))
+    return [str(v).strip() for v in col]
+
+def _where(mask):
+    if np is not None:
+        return np.flatnonzero(mask).tolist()
+    return [i for i, m in enumerate(mask) if m]
+
+def _blank(col):
+    if np is not None:
+        return col == ""
+    return [not v for v in col]
+
+def _quantities(col, raw):
+    """Кількості колонкою: рядки з цифр ASCII розбираються без int(), решта — через _quantity."""
+    if np is not None:
+        ok = (col != "") & (np.char.strip(col, "0123456789") == "")
+        norm = np.char.lstrip(col, "0")
+        norm[ok & (norm == "")] = "0"
+        fast = zip(norm.tolist(), ok.tolist())
+    else:
+        fast = (((v.lstrip("0") or "0"), True) if v.isascii() and v.isdigit() else (None, False) for v in col)
+    return [v if ok else _quantity(r) for (v, ok), r in zip(fast, raw)]
+
+def validate_rows(rows, require_id=False, keep_created=False):
+    """Перевіряє багато рядків одразу — колонками, а не словник за словником.
+
+    Повертає (items, errors): items[i] — нормалізований рядок або None,
+    errors — {номер рядка: [(поле, повідомлення), ...]} з усіма помилками рядка.
+    Порожній id замінюється новим uuid (або є помилкою з require_id);
+    повтор id у межах rows — помилка кожного наступного входження.
+    created_at береться з рядка, якщо keep_created і він не порожній.
+    Правила полів ті самі, що у validate_item (_quantity, _price);
+    з NumPy обрізання, перевірки порожніх значень і кількостей векторизовані.
+    """
+    errors = {}
+    def fail(idx, field, key=None):
+        for i in idx:
+            errors.setdefault(pos[i], []).append((field, ERRORS[key or field]))
+
+    pos = [i for i, r in enumerate(rows) if isinstance(r, dict)]
+    for i, r in enumerate(rows):
+        if not isinstance(r, dict):
+            errors[i] = [(None, ERRORS["row"])]
+    dicts = [rows[i] for i in pos]
+    raw = {f: [r.get(f, "") for r in dicts] for f in FIELDS}
+    raw["id"] = [r.get("id") or "" for r in dicts]
+    raw["quantity"] = [r.get("quantity", 0) for r in dicts]
+    raw["price"] = [r.get("price", "0") for r in dicts]
+    cols = {f: _strings(raw[f]) for f in FIELDS if f != "price"}
+
+    blank = _where(_blank(cols["id"]))
+    if require_id:
+        fail(blank, "id")
+    ids = [str(v) for v in raw["id"]]  # id не обрізається, як і у validate_item
+    if not require_id:
+        for i in blank:
+            ids[i] = str(uuid.uuid4())
+    seen = set()
+    fail([i for i, v in enumerate(ids) if v and (v in seen or seen.add(v))], "id", "duplicate")
+    fail(_where(_blank(cols["name"])), "name")
+    fail(_where(_blank(cols["category"])), "category")
+    quantities = _quantities(cols["quantity"], raw["quantity"])
+    fail([i for i, v in enumerate(quantities) if v is None], "quantity")
+    prices = [_price(v) for v in raw["price"]]
+    fail([i for i, v in enumerate(prices) if v is None], "price")
+
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    names, categories, locations, created = (
+        cols[f].tolist() if np is not None else cols[f] for f in ("name", "category", "location", "created_at"))
+    created = [c or now for c in created] if keep_created else [now] * len(dicts)
+    items = [None] * len(rows)
+    for i, row in zip(pos, zip(ids, names, categories, quantities, prices, locations, created)):
+        if i not in errors:
+            items[i] = dict(zip(FIELDS, row))
+    return items, errors
@@ -0,0 +1,50 @@
+import queue, threading
+import metrics
+from concurrent.futures import Future
+
+class WriteQueue:
+    """Єдиний потік-записувач: черга змін і групова фіксація одним fsync.
+
+    Обробники HTTP передають функцію op(batch) і чекають на її результат.
+    Усе, що накопичилось у черзі, поки записувач фіксував попередню групу,
+    застосовується однією транзакцією сховища.
+    """
+
+    def __init__(self, store, max_batch=512):
+        self.store = store
+        self.max_batch = max_batch
+        self._q = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="inventory-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, op):
+        fut = Future()
+        self._q.put((op, fut))
+        return fut.result()
+
+    def _run(self):
+        while True:
+            jobs = [self._q.get()]
+            while len(jobs) < self.max_batch:
+                try:
+                    jobs.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+            results = []
+            try:
+                with metrics.timed("inventory_stage_seconds", stage="save"), self.store.batch() as b:
+                    for op, fut in jobs:
+                        try:
+                            results.append((fut, op(b), None))
+                        except Exception as e:
+                            results.append((fut, None, e))
+                metrics.inc("inventory_rows_written_total", len(b.records))
+            except Exception as e:
+                for _, fut in jobs:
+                    fut.set_exception(e)
+                continue
+            for fut, res, err in results:
+                if err is not None:
+                    fut.set_exception(err)
+                else:
+                    fut.set_result(res)
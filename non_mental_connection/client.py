@@ -3,10 +3,41 @@ import socket, threading, json, sys
 SERVER_HOST = '127.0.0.1'   
 SERVER_PORT = 5000
 
+positions = {}             # локальна карта координат: ім'я -> [x, y]
+sync_state = {"tick": -1}  # такт останнього повного знімка
+
 def send_json(sock, obj):
     data = (json.dumps(obj) + '\n').encode('utf-8')
     sock.sendall(data)
 
+def print_positions():
+    print("[positions]")
+    if not positions:
+        print("  (нічого)")
+    for user, coords in list(positions.items()):
+        print(f"  {user}: {coords}")
+
+def apply_snapshot(msg):
+    """Повний знімок замінює локальну карту; друкуємо лише якщо вона розійшлась із сервером."""
+    pos = msg.get('positions', {})
+    first = sync_state['tick'] < 0
+    sync_state['tick'] = msg.get('tick', sync_state['tick'])
+    if first or pos != positions:
+        positions.clear()
+        positions.update(pos)
+        print_positions()
+
+def apply_delta(msg):
+    """Дельта за такт: змінені координати і ті, хто зник. Старіші за знімок пропускаються."""
+    if msg.get('tick', 0) <= sync_state['tick']:
+        return
+    for user, coords in msg.get('moved', {}).items():
+        positions[user] = coords
+        print(f"[positions] {user}: {coords}")
+    for user in msg.get('removed', []):
+        if positions.pop(user, None) is not None:
+            print(f"[positions] {user} зник")
+
 def listen_thread(sock):
     f = sock.makefile('r', encoding='utf-8')
     try:
@@ -21,12 +52,9 @@ def listen_thread(sock):
                 continue
             mtype = msg.get('type')
             if mtype == 'positions':
-                pos = msg.get('positions', {})
-                print("[positions]")
-                if not pos:
-                    print("  (нічого)")
-                for user, coords in pos.items():
-                    print(f"  {user}: {coords}")
+                apply_snapshot(msg)
+            elif mtype == 'positions_delta':
+                apply_delta(msg)
             elif mtype == 'message':
                 user = msg.get('user')
                 text = msg.get('text')
@@ -64,6 +92,9 @@ def main():
             line = input()
             if not line:
                 continue
+            if line.strip() == '/positions':
+                print_positions()
+                continue
             if line.startswith('/move'):
                 parts = line.split()
                 if len(parts) != 3:
@@ -1,57 +1,331 @@
-import socket, threading, json
+import asyncio, json, math, time
+from collections import deque
 
 HOST = '0.0.0.0'
 PORT = 5000
+BACKLOG = 1024
+MAX_LINE = 64 * 1024              # найдовше повідомлення від клієнта
+WRITE_BUFFER_LIMIT = 64 * 1024    # буфер сокета, після якого записувач чекає (drain)
+SEND_QUEUE_HIGH = 256             # кадрів у черзі: вище — клієнт вважається повільним
+SEND_QUEUE_MAX = 4096             # кадрів у черзі: вище — відключаємо одразу
+SLOW_CLIENT_TIMEOUT = 5.0         # секунд над SEND_QUEUE_HIGH до відключення
+STATS_INTERVAL = 60               # секунд між звітами про розсилку (0 — не звітувати)
+TICK_RATE = 20                    # розсилок переміщень за секунду
+SNAPSHOT_INTERVAL = 5.0           # секунд між повними знімками positions
+INTEREST_RADIUS = 100.0           # клієнт бачить координати лише ближчих за це; None — усіх
+CHAT_RADIUS = None                # те саме для повідомлень чату; None — усім
 
-clients_lock = threading.Lock()
-clients = {}      
-positions = {}    
+clients = {}
+# encoded — кадри, серіалізовані json.dumps; queued — їхні копії, поставлені в черги клієнтів;
+# queued - encoded — серіалізації, яких вдалося уникнути
+stats = {"encoded": 0, "encoded_bytes": 0, "queued": 0, "queued_bytes": 0, "coalesced": 0}
 
-def send_json(sock, obj):
-    try:
-        data = (json.dumps(obj) + '\n').encode('utf-8')
-        sock.sendall(data)
-    except Exception:
-        raise
+class Frame:
+    """Повідомлення, серіалізоване один раз.
+
+    Усі отримувачі тримають посилання на той самий незмінний об'єкт bytes,
+    тож розсилка N клієнтам не копіює і не кодує його N разів.
+    """
+    __slots__ = ('data', 'kind')
+
+    def __init__(self, obj, kind=None):
+        self.data = (json.dumps(obj) + '\n').encode('utf-8')
+        self.kind = kind
+        stats["encoded"] += 1
+        stats["encoded_bytes"] += len(self.data)
+
+class Client:
+    """Підключений клієнт: обмежена черга кадрів і власна задача-записувач.
+
+    Розсилка лише додає готові байти в чергу, тож повільний клієнт не
+    затримує інших. Кадр зі значенням kind (знімок positions) замінює ще не
+    відправлений кадр того ж виду — застарілий стан не накопичується.
+    """
+
+    def __init__(self, name, writer):
+        self.name = name
+        self.writer = writer
+        self.queue = deque()
+        self.pending = {}          # kind -> ще не відправлений кадр у черзі
+        self.over_since = None     # коли черга перевищила SEND_QUEUE_HIGH
+        self.wakeup = asyncio.Event()
+        writer.transport.set_write_buffer_limits(high=WRITE_BUFFER_LIMIT)
+        self.task = asyncio.create_task(self._drain())
+
+    def send(self, frame):
+        """Ставить кадр у чергу; ConnectionError, якщо клієнт закритий або безнадійно відстав."""
+        if self.writer.transport.is_closing():
+            raise ConnectionError("з'єднання закрито")
+        stats["queued"] += 1
+        stats["queued_bytes"] += len(frame.data)
+        slot = self.pending.get(frame.kind) if frame.kind else None
+        if slot is not None:
+            slot[0] = frame
+            stats["coalesced"] += 1
+            return
+        slot = [frame]
+        self.queue.append(slot)
+        if frame.kind:
+            self.pending[frame.kind] = slot
+        self.wakeup.set()
+        if len(self.queue) > SEND_QUEUE_HIGH:
+            now = time.monotonic()
+            if self.over_since is None:
+                self.over_since = now
+            if len(self.queue) > SEND_QUEUE_MAX or now - self.over_since > SLOW_CLIENT_TIMEOUT:
+                raise ConnectionError("клієнт не встигає читати")
+
+    async def _drain(self):
+        try:
+            while True:
+                await self.wakeup.wait()
+                self.wakeup.clear()
+                slots = list(self.queue)
+                self.queue.clear()
+                self.pending.clear()
+                self.over_since = None
+                self.writer.writelines(slot[0].data for slot in slots)
+                await self.writer.drain()
+        except (ConnectionError, OSError):
+            self.writer.transport.abort()  # читач у handle_client побачить закриття
+
+    def close(self):
+        self.task.cancel()
+        self.writer.transport.abort()
+
+def send_json(client, obj, kind=None):
+    client.send(Frame(obj, kind))
+
+class SpatialGrid:
+    """Рівномірна сітка над координатами: клітинка -> імена в ній.
+
+    Пошук сусідів переглядає лише клітинки, що перетинають коло, тож його
+    вартість залежить від щільності поруч, а не від загальної кількості.
+    """
+
+    def __init__(self, cell):
+        self.cell = cell
+        self.cells = {}
+        self.where = {}
+
+    def _key(self, x, y):
+        return math.floor(x / self.cell), math.floor(y / self.cell)
+
+    def move(self, name, x, y):
+        key = self._key(x, y)
+        old = self.where.get(name)
+        if old == key:
+            return
+        if old is not None:
+            self._discard(name, old)
+        self.cells.setdefault(key, set()).add(name)
+        self.where[name] = key
+
+    def remove(self, name):
+        old = self.where.pop(name, None)
+        if old is not None:
+            self._discard(name, old)
+
+    def _discard(self, name, key):
+        names = self.cells[key]
+        names.discard(name)
+        if not names:
+            del self.cells[key]
+
+    def near(self, x, y, radius, positions):
+        """Імена з positions у межах radius від (x, y)."""
+        cx, cy = self._key(x, y)
+        n = math.ceil(radius / self.cell)
+        r2 = radius * radius
+        for i in range(cx - n, cx + n + 1):
+            for j in range(cy - n, cy + n + 1):
+                for name in self.cells.get((i, j), ()):
+                    px, py = positions[name]
+                    if (px - x) ** 2 + (py - y) ** 2 <= r2:
+                        yield name
+
+class PositionSync:
+    """Накопичує переміщення і розсилає їх раз на такт (TICK_RATE разів на секунду).
+
+    Клієнти отримують лише змінені координати (positions_delta), а раз на
+    SNAPSHOT_INTERVAL секунд — повний знімок positions для ресинхронізації.
+    Обидва повідомлення мають номер такту tick: дельту, не новішу за останній
+    отриманий знімок, клієнт пропускає — у черзі повільного клієнта знімок
+    замінюється новішим і може випередити дельти.
+
+    З INTEREST_RADIUS кожен отримує лише тих, хто в межах радіуса від нього
+    (і себе): visible зберігає, кого клієнт зараз бачить, тож при виході
+    з радіуса він отримує removed, а при вході — координати. Клієнт без
+    координат нікого не бачить, доки не надішле свою позицію.
+    """
+
+    def __init__(self):
+        self.positions = {}
+        self.moved = set()
+        self.removed = set()
+        self.tick = 0
+        self.snapshot_ticks = max(1, round(TICK_RATE * SNAPSHOT_INTERVAL))
+        self.grid = SpatialGrid(INTEREST_RADIUS) if INTEREST_RADIUS else None
+        self.visible = {}   # ім'я -> кого воно бачить (видимість симетрична)
+
+    def move(self, user, x, y):
+        self.positions[user] = [x, y]
+        self.moved.add(user)
+        self.removed.discard(user)
+        if self.grid:
+            self.grid.move(user, x, y)
 
-def broadcast(obj, exclude_name=None):
-    """Розсилає JSON всім підключеним клієнтам, опціонально виключаючи одного."""
+    def remove(self, user):
+        if self.positions.pop(user, None) is not None:
+            self.moved.discard(user)
+            self.removed.add(user)
+            if self.grid:
+                self.grid.remove(user)
+
+    def nearby(self, user, radius):
+        """Імена в межах radius від user (разом із ним); без координат — лише сам user."""
+        pos = self.positions.get(user)
+        if pos is None:
+            return [user]
+        if self.grid is None:
+            r2 = radius * radius
+            return [v for v, (x, y) in self.positions.items() if (x - pos[0]) ** 2 + (y - pos[1]) ** 2 <= r2]
+        return list(self.grid.near(pos[0], pos[1], radius, self.positions))
+
+    def snapshot(self, name=None):
+        positions = self.positions
+        if self.grid and name is not None:
+            positions = {v: self.positions[v] for v in self.visible.get(name, ()) if v in self.positions}
+            if name in self.positions:
+                positions[name] = self.positions[name]
+        return {"type":"positions","tick":self.tick,"positions":positions}
+
+    def interest(self, moved, removed):
+        """Оновлює visible і повертає {отримувач: (кого надіслати, хто зник)} за цей такт."""
+        updates = {}
+        def to(name):
+            u = updates.get(name)
+            if u is None:
+                u = updates[name] = (set(), [])
+            return u
+        for u in removed:
+            for v in self.visible.pop(u, ()):
+                self.visible.get(v, set()).discard(u)
+                to(v)[1].append(u)
+        for u in moved:
+            x, y = self.positions[u]
+            new = set(self.grid.near(x, y, INTEREST_RADIUS, self.positions))
+            new.discard(u)
+            old = self.visible.get(u, set())
+            mine = to(u)[0]
+            mine.add(u)
+            for v in new - old:
+                mine.add(v)
+                self.visible.setdefault(v, set()).add(u)
+            for v in old - new:
+                to(u)[1].append(v)
+                to(v)[1].append(u)
+                self.visible.get(v, set()).discard(u)
+            for v in new:
+                to(v)[0].add(u)
+            self.visible[u] = new
+        return updates
+
+    def flush(self):
+        self.tick += 1
+        moved, removed = self.moved, self.removed
+        # розсилка може відключити клієнтів і викликати remove — це піде в наступний такт
+        self.moved, self.removed = set(), set()
+        if self.grid is None:
+            if self.tick % self.snapshot_ticks == 0:
+                broadcast(self.snapshot(), kind="positions")
+            elif moved or removed:
+                broadcast({"type":"positions_delta","tick":self.tick,
+                           "moved":{u: self.positions[u] for u in moved},"removed":list(removed)})
+            return
+        updates = self.interest(moved, removed)
+        if self.tick % self.snapshot_ticks == 0:
+            send_each({name: self.snapshot(name) for name in clients}, kind="positions")
+        elif updates:
+            send_each({name: {"type":"positions_delta","tick":self.tick,
+                              "moved":{u: self.positions[u] for u in m},"removed":r}
+                       for name, (m, r) in updates.items() if name in clients})
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        period = 1 / TICK_RATE
+        next_at = loop.time()
+        while True:
+            next_at += period
+            await asyncio.sleep(max(0, next_at - loop.time()))
+            self.flush()
+
+sync = PositionSync()
+
+def broadcast(obj, exclude_name=None, kind=None, names=None):
+    """Розсилає JSON всім підключеним клієнтам (або лише names), опціонально виключаючи одного.
+
+    Повідомлення серіалізується один раз; кожному клієнту йде той самий Frame.
+    """
+    frame = Frame(obj, kind)
     dead = []
-    with clients_lock:
-        for name, sock in list(clients.items()):
-            if name == exclude_name:
-                continue
-            try:
-                send_json(sock, obj)
-            except Exception:
-                dead.append(name)
-        for name in dead:
-            sock = clients.pop(name, None)
-            positions.pop(name, None)
-            print(f"[server] видалено {name} через помилку при відправці")
-
-def handle_client(conn, addr):
+    for name in list(clients) if names is None else names:
+        client = clients.get(name)
+        if client is None or name == exclude_name:
+            continue
+        try:
+            client.send(frame)
+        except ConnectionError:
+            dead.append(name)
+    drop(dead)
+
+def send_each(messages, kind=None):
+    """Кожному клієнту — власне повідомлення: {ім'я: об'єкт}."""
+    dead = []
+    for name, obj in messages.items():
+        client = clients.get(name)
+        if client is None:
+            continue
+        try:
+            client.send(Frame(obj, kind))
+        except ConnectionError:
+            dead.append(name)
+    drop(dead)
+
+def drop(dead):
+    for name in dead:
+        client = clients.pop(name, None)
+        sync.remove(name)
+        if client:
+            client.close()  # його handle_client завершиться і повідомить інших
+        print(f"[server] видалено {name} через помилку при відправці")
+
+async def handle_client(reader, writer):
+    addr = writer.get_extra_info('peername')
     print(f"[server] нове підключення {addr}")
-    f = conn.makefile('r', encoding='utf-8')
-    name = None
+    name = client = None
     try:
-        line = f.readline()
+        line = await reader.readline()
         if not line:
             return
         msg = json.loads(line)
-        if msg.get('type') != 'register' or not msg.get('user'):
-            conn.close()
+        if msg.get('type') != 'register' or not isinstance(msg.get('user'), str) or not msg['user']:
+            return
+        if msg['user'] in clients:
+            # ім'я вже зайняте підключеним клієнтом — не даємо його перехопити
+            writer.write((json.dumps({"type":"message","user":"server",
+                                      "text":f"ім'я {msg['user']} уже зайняте"}) + '\n').encode('utf-8'))
+            print(f"[server] {addr}: ім'я {msg['user']} уже зайняте")
             return
-        name = msg['user']
-        with clients_lock:
-            clients[name] = conn
+        name = msg['user']  # далі всі повідомлення з'єднання — від цього імені, поле user ігнорується
+        client = clients[name] = Client(name, writer)
         print(f"[server] {name} зареєстрований")
         broadcast({"type":"message","user":"server","text":f"{name} увійшов у чат"}, exclude_name=None)
-        send_json(conn, {"type":"positions","positions":positions})
+        send_json(client, sync.snapshot(name), kind="positions")
 
         while True:
-            line = f.readline()
-            if not line: 
+            line = await reader.readline()
+            if not line:
                 break
             try:
                 msg = json.loads(line)
@@ -61,44 +335,54 @@ def handle_client(conn, addr):
             if mtype == 'position':
                 x = float(msg.get('x', 0))
                 y = float(msg.get('y', 0))
-                with clients_lock:
-                    positions[msg.get('user')] = [x, y]
-                broadcast({"type":"positions","positions":positions})
+                if not (math.isfinite(x) and math.isfinite(y)):
+                    continue
+                sync.move(name, x, y)  # розішлеться на найближчому такті
             elif mtype == 'message':
-                broadcast({"type":"message","user":msg.get('user'), "text":msg.get('text')})
+                near = sync.nearby(name, CHAT_RADIUS) if CHAT_RADIUS is not None else None
+                broadcast({"type":"message","user":name, "text":msg.get('text')}, names=near)
             else:
                 pass
     except Exception as e:
         print(f"[server] помилка для {addr}: {e}")
     finally:
-        with clients_lock:
-            if name and name in clients:
-                clients.pop(name, None)
-            if name and name in positions:
-                positions.pop(name, None)
+        if client and clients.get(name) is client:
+            clients.pop(name, None)
+            sync.remove(name)
         print(f"[server] {name or addr} відключився")
-        broadcast({"type":"message","user":"server","text":f"{name or addr} вийшов"}, exclude_name=None)
-        broadcast({"type":"positions","positions":positions})
-        try:
-            conn.close()
-        except:
-            pass
+        if client:
+            broadcast({"type":"message","user":"server","text":f"{name} вийшов"}, exclude_name=None)
+            client.close()
+        else:
+            writer.close()
 
-def main():
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    sock.bind((HOST, PORT))
-    sock.listen(5)
+async def report_stats():
+    last = None
+    while True:
+        await asyncio.sleep(STATS_INTERVAL)
+        if stats == last:
+            continue
+        last = dict(stats)
+        print(f"[server] розсилка: серіалізовано {stats['encoded']} кадрів ({stats['encoded_bytes'] // 1024} КБ), "
+              f"у черги клієнтів {stats['queued']} ({stats['queued_bytes'] // 1024} КБ), "
+              f"уникнуто серіалізацій: {stats['queued'] - stats['encoded']}, злито знімків: {stats['coalesced']}")
+
+async def serve():
+    # усі клієнти обслуговуються одним циклом подій без потоку на з'єднання;
+    # для 10k+ з'єднань потрібен відповідний ліміт дескрипторів (ulimit -n)
+    server = await asyncio.start_server(handle_client, HOST, PORT, limit=MAX_LINE,
+                                        backlog=BACKLOG, reuse_address=True)
     print(f"[server] слухаю на {HOST}:{PORT}")
+    ticker = asyncio.create_task(sync.run())  # тримаємо посилання на фонові задачі
+    reporter = asyncio.create_task(report_stats()) if STATS_INTERVAL else None
+    async with server:
+        await server.serve_forever()
+
+def main():
     try:
-        while True:
-            conn, addr = sock.accept()
-            t = threading.Thread(target=handle_client, args=(conn, addr), daemon=True)
-            t.start()
+        asyncio.run(serve())
     except KeyboardInterrupt:
         print("\n[server] зупинка сервера")
-    finally:
-        sock.close()
 
 if __name__ == '__main__':
     main()